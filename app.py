@@ -1,8 +1,44 @@
 import streamlit as st
-import sqlite3
+import os
+import hmac
 import datetime
 import pandas as pd
-import pytz # Import the pytz library for timezone conversion
+import profiling
+import backup
+import import_export
+from database import (
+    ensure_schema,
+    rebuild_grievance_stats,
+    add_grievance,
+    get_grievances_page,
+    get_grievance_changes,
+    get_latest_change_id,
+    search_grievances,
+    get_grievance_stats,
+    get_due_counts,
+    get_due_grievances,
+    get_daily_trends,
+    get_resolution_times,
+    today_ist,
+    DUE_SOON_DAYS,
+    update_grievance_status,
+    delete_grievance,
+    bulk_update_grievance_status,
+    bulk_delete_grievances,
+    update_grievances,
+    archive_resolved_grievances,
+    reclaim_free_pages,
+    ARCHIVE_AFTER_DAYS,
+    normalize_hub_id,
+    get_read_cache,
+    get_connection_pool,
+    write_lock_stats,
+    get_write_queue,
+    WRITE_QUEUE_ENABLED,
+    CATEGORY_OPTIONS,
+    SEVERITY_OPTIONS,
+    STATUS_OPTIONS,
+)
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -12,106 +48,31 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
-# --- Database Setup ---
-DB_NAME = "love_grievances.db"
-
-def get_db_connection():
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row # Allows accessing columns by name
-    return conn
-
-def create_tables():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS grievances (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP, -- Stored as UTC by SQLite default
-            title TEXT NOT NULL,
-            details TEXT,
-            category TEXT,
-            severity TEXT,
-            status TEXT DEFAULT '💖 Open',
-            resolution_notes TEXT,
-            submitted_by TEXT DEFAULT 'My Love ❤️',
-            target_resolution_date DATE
-        )
-    """)
-    conn.commit()
-    conn.close()
-
-# Initialize database and tables
-create_tables()
-
-# --- Helper Functions ---
-def add_grievance(title, details, category, severity, target_date):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO grievances (title, details, category, severity, target_resolution_date, status)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (title, details, category, severity, target_date, '💖 Open'))
-    conn.commit()
-    conn.close()
-
-def get_all_grievances():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    # Fetch the raw timestamp string
-    cursor.execute("SELECT id, timestamp, title, details, category, severity, status, resolution_notes, target_resolution_date FROM grievances ORDER BY timestamp DESC")
-    grievances_raw = cursor.fetchall()
-    conn.close()
-
-    processed_grievances = []
-    ist_timezone = pytz.timezone('Asia/Kolkata')
-    utc_timezone = pytz.utc
-
-    for row_raw in grievances_raw:
-        row = dict(row_raw) # Convert sqlite3.Row to dict for easier manipulation
-        
-        # Convert timestamp from UTC to IST
-        utc_dt_str = row['timestamp'] # This is a string like 'YYYY-MM-DD HH:MM:SS'
-        
-        # Parse the string to a naive datetime object
-        naive_dt = datetime.datetime.strptime(utc_dt_str, '%Y-%m-%d %H:%M:%S')
-        
-        # Localize the naive datetime object to UTC
-        utc_dt = utc_timezone.localize(naive_dt)
-        
-        # Convert to IST
-        ist_dt = utc_dt.astimezone(ist_timezone)
-        
-        # Format for display
-        row['submitted_on'] = ist_dt.strftime('%Y-%m-%d %I:%M %p IST') # e.g., 2025-05-20 01:50 PM IST
-        
-        # Remove the original timestamp if you don't need it directly in the DataFrame later
-        # del row['timestamp'] 
-        # Or keep it if you want the original UTC string for some reason, but 'submitted_on' will be used for display
+# --- Profiling (opt-in: LOVE_HUB_PROFILE=1) ---
+profiling.start_rerun()
 
-        processed_grievances.append(row)
-        
-    return processed_grievances
-
-
-def update_grievance_status(grievance_id, new_status, resolution_notes=""):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        UPDATE grievances
-        SET status = ?, resolution_notes = ?
-        WHERE id = ?
-    """, (new_status, resolution_notes, grievance_id))
-    conn.commit()
-    conn.close()
-
-def delete_grievance(grievance_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM grievances WHERE id = ?", (grievance_id,))
-    conn.commit()
-    conn.close()
+# --- Database Setup ---
+# Apply any pending schema migrations (only the first rerun in this process does any work)
+profiling.phase("schema")
+ensure_schema()
+backup.start_backup_scheduler() # Background snapshots when LOVE_HUB_BACKUP_EVERY_HOURS is set
+
+# --- Current Hub ---
+# One deployment serves many hubs; each link carries its own (?hub=our-hub), no parameter means the default hub
+try:
+    hub_id = normalize_hub_id(st.query_params.get("hub"))
+except ValueError as e:
+    st.error(f"Oops! {e} 💔")
+    st.stop()
+
+# --- Admin ---
+# Whole-database tools (every hub's stats, backups, reclaiming space, process counters) only show up
+# for a link carrying ?admin=<LOVE_HUB_ADMIN_KEY>; with no key set they're left to the CLIs.
+ADMIN_KEY = os.environ.get("LOVE_HUB_ADMIN_KEY", "")
+is_admin = bool(ADMIN_KEY) and hmac.compare_digest(st.query_params.get("admin", ""), ADMIN_KEY)
 
 # --- App Styling (CSS focused on selectbox and chart visibility) ---
+profiling.phase("styles")
 st.markdown("""
 <style>
     :root {
@@ -386,31 +347,117 @@ st.markdown("""
 
 
 # --- Sidebar for Navigation and Info ---
+profiling.phase("sidebar")
 st.sidebar.title("💖 Love Hub Navigation 💖") 
 st.sidebar.markdown("---")
 app_mode = st.sidebar.radio(
     "Sweetheart, what shall we do?", 
-    ["💌 Submit New Grievance", "📝 View & Manage Grievances", "📊 Our Love Stats"],
-    captions=["Share your heart's whispers.", "See what we're working on.", "A peek at our love's journey." , "Miss. V Sai Keerthi."] # Extra caption added by user
+    ["💌 Submit New Grievance", "📝 View & Manage Grievances", "⏰ Overdue & Due Soon", "📊 Our Love Stats"],
+    captions=["Share your heart's whispers.", "See what we're working on.", "What needs our love first.", "A peek at our love's journey." , "Miss. V Sai Keerthi."] # Extra caption added by user
 )
+profiling.set_page(app_mode)
+st.sidebar.caption(f"🏠 Hub: {hub_id}")
 st.sidebar.markdown("---")
 st.sidebar.markdown("Made with heaps of love, for my one and only! 🥰") 
 st.sidebar.markdown("<p style='text-align: center; font-size: 50px;'>💕</p>", unsafe_allow_html=True)
 
+def show_stats_check(action, drift, every_hub=False):
+    if not drift:
+        st.success(f"Stats rollup {action}: everything adds up perfectly! 💞")
+    else:
+        st.warning(f"Stats rollup {action}: found {len(drift)} drifted count(s)" + (" and fixed them. 🔧" if action == "rebuilt" else "."))
+        drift_df = pd.DataFrame(drift)
+        st.dataframe(drift_df if every_hub else drift_df.drop(columns="hub_id"), hide_index=True)
+
+# Everything in here only touches this hub's notes
+with st.sidebar.expander("🧰 Love Hub Maintenance"):
+    verify_col, rebuild_col = st.columns(2)
+    stats_check = None
+    if verify_col.button("Verify Stats 🔍", key="verify_stats", use_container_width=True):
+        stats_check = ("verified", rebuild_grievance_stats(verify_only=True, hub_id=hub_id))
+    if rebuild_col.button("Rebuild Stats 🔧", key="rebuild_stats", use_container_width=True):
+        stats_check = ("rebuilt", rebuild_grievance_stats(hub_id=hub_id))
+    if stats_check is not None:
+        show_stats_check(*stats_check)
+    # Long-resolved notes move to the archive: still searchable and counted, just off the ledger
+    archive_days = st.number_input("Archive resolved notes older than (days):", min_value=0, value=ARCHIVE_AFTER_DAYS, step=30, key="archive_after_days")
+    if st.button("Archive Resolved 🗄️", key="archive_resolved", use_container_width=True):
+        archived = archive_resolved_grievances(archive_days, hub_id=hub_id)
+        st.success(f"Archived {archived} resolved love notes. 🗄️")
+    # Export is generated only when the download is clicked, off the script thread
+    export_format = st.selectbox("Export format:", import_export.FORMATS, key="export_format")
+    st.download_button(
+        "Download All Notes 📥",
+        data=lambda: import_export.export_grievances_bytes(export_format, hub_id=hub_id),
+        file_name=f"love_hub_{hub_id}.{export_format}",
+        mime={"csv": "text/csv", "jsonl": "application/jsonl", "parquet": "application/vnd.apache.parquet"}[export_format],
+        key="export_download",
+        use_container_width=True
+    )
+
+# The whole database, every hub at once: admin links only
+if is_admin:
+    with st.sidebar.expander("🔐 Admin: Whole Database"):
+        stats_check = None
+        verify_col, rebuild_col = st.columns(2)
+        if verify_col.button("Verify All Hubs 🔍", key="verify_all_stats", use_container_width=True):
+            stats_check = ("verified", rebuild_grievance_stats(verify_only=True))
+        if rebuild_col.button("Rebuild All Hubs 🔧", key="rebuild_all_stats", use_container_width=True):
+            stats_check = ("rebuilt", rebuild_grievance_stats())
+        if stats_check is not None:
+            show_stats_check(*stats_check, every_hub=True)
+        # Hands the pages freed by archiving back to the filesystem
+        if st.button("Reclaim Free Space 🧹", key="reclaim_free_pages", use_container_width=True):
+            reclaimed = reclaim_free_pages() # Incremental only: never a full VACUUM from here
+            if reclaimed['incremental']:
+                st.success(f"Freed {reclaimed['freed_pages']} pages. 🧹")
+            else:
+                st.warning("This database can't hand archived space back yet. Switching it over rewrites the whole file and pauses every write while it runs, so do it once from a terminal: `python database.py enable-incremental-vacuum` 🧹")
+        # Online snapshot: writers keep going while it's taken
+        if st.button("Back Up Now 💾", key="backup_now", use_container_width=True):
+            snapshot = backup.create_backup()
+            st.success(f"Saved {snapshot['path']} ({snapshot['bytes'] / 1024:,.0f} KiB) in {snapshot['seconds']:.1f}s. Our memories are safe! 💾")
+        snapshots = backup.list_backups()
+        if snapshots:
+            st.caption(f"{len(snapshots)} snapshot(s), newest: {snapshots[0]}")
+        read_cache = get_read_cache()
+        st.caption(f"Read cache: {read_cache.hits} hits, {read_cache.misses} misses")
+        st.caption(f"Connection pool: {get_connection_pool().waits} waits for a free connection")
+        st.caption(f"Write lock: {write_lock_stats.waits} waits, {write_lock_stats.timeouts} timeouts")
+        if WRITE_QUEUE_ENABLED:
+            write_queue = get_write_queue()
+            st.caption(f"Write queue: {write_queue.writes_committed} writes in {write_queue.batches_committed} group commits")
+
+
+# --- Live Refresh ---
+# Other sessions' changes show up without anyone touching the page: a small fragment wakes up
+# every few seconds and compares SQLite's data_version (one PRAGMA, no table reads) with the
+# version this page was drawn from. Only when it moved does the whole page rerun.
+LIVE_REFRESH_SECONDS = 5
+
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def live_refresh(seen_version, auto=True):
+    if get_read_cache().data_version() == seen_version:
+        st.caption("🔄 Live: you're looking at the latest love notes.")
+    elif auto:
+        st.rerun(scope="app")
+    # Rerunning would throw away unsaved edits (e.g. in the grid), so offer it instead
+    elif st.button("🔄 New love notes arrived - show them", key="live_refresh_now"):
+        st.rerun(scope="app")
+
 
 # --- Main App Logic ---
 
 if app_mode == "💌 Submit New Grievance":
+    profiling.phase("submit: form")
     st.header("💌 Share Your Heart's Whispers...")
     st.markdown("It's always okay to share what's on your mind, my love. I'm here to listen and make things even more wonderful between us. 💕")
 
     with st.form("grievance_form", clear_on_submit=True):
         title = st.text_input("💖 What's the little (or big) thing, darling?", placeholder="E.g., Missing our daily good morning texts")
         details = st.text_area("💬 Tell me more about it...", placeholder="E.g., It makes my day start a little brighter when I hear from you first thing!", height=150)
-        category_options = ["Quality Time 🕰️", "Communication 🗣️", "Chores & Responsibilities 🧹", "Appreciation & Affection 🥰", "Future Plans 🌟", "Little Annoyances 🤏", "Date Night Ideas ✨", "Other Sweet Nothings 🤔"]
-        category = st.selectbox("🏷️ What's it related to?", category_options, placeholder="Choose a category...", index=None) 
-        severity_options = ["🥺 Mild Heartache", "😥 Needs Prompt Attention", "😭 Emergency Snuggle Protocol!"]
-        severity = st.selectbox("💔 How much does it tug at your heartstrings?", severity_options, placeholder="Select severity...", index=None) 
+        category = st.selectbox("🏷️ What's it related to?", CATEGORY_OPTIONS, placeholder="Choose a category...", index=None) 
+        severity = st.selectbox("💔 How much does it tug at your heartstrings?", SEVERITY_OPTIONS, placeholder="Select severity...", index=None) 
         
         today = datetime.date.today()
         target_date = st.date_input("🗓️ When would you ideally like us to resolve this by, precious?", min_value=today, value=today + datetime.timedelta(days=7))
@@ -425,102 +472,325 @@ if app_mode == "💌 Submit New Grievance":
             elif not severity: 
                 st.error("Please select how much this tugs at your heartstrings, my love. 💔")
             else:
-                add_grievance(title, details, category, severity, target_date)
+                add_grievance(title, details, category, severity, target_date, hub_id=hub_id)
                 st.success(f"'{title}' has been lovingly noted. I'll look into it right away, sweetheart! ✨")
                 st.balloons()
 
 elif app_mode == "📝 View & Manage Grievances":
+    profiling.phase("ledger: controls")
     st.header("📝 Our Heart's Ledger") 
     st.markdown("Here's everything we're nurturing together, to make our love story even more beautiful. 💪💖")
 
-    grievances = get_all_grievances()
-
-    if not grievances:
+    # Message left by an action that triggered a rerun (e.g. a bulk update)
+    if "ledger_flash" in st.session_state:
+        flash_kind, flash_message = st.session_state.pop("ledger_flash")
+        getattr(st, flash_kind)(flash_message)
+
+    page_size = st.selectbox(
+        "Notes per page:",
+        [10, 25, 50, 100],
+        index=1,
+        key="ledger_page_size"
+    )
+
+    search_query = st.text_input(
+        "🔎 Search our love notes:",
+        key="ledger_search",
+        placeholder="E.g., good morning texts"
+    ).strip()
+
+    profiling.phase("ledger: load pages")
+    # The loaded notes live in session state and are patched from the change feed, so a change
+    # anywhere costs this session the changed rows, not a reload of every page it has open.
+    # Search results page by rank (a page number), the ledger by keyset cursor.
+    def load_ledger_page(cursor):
+        if search_query:
+            return search_grievances(search_query, page_size, cursor or 0, hub_id=hub_id)
+        return get_grievances_page(page_size, cursor, hub_id=hub_id)
+
+    def patch_ledger_rows(loaded):
+        # Applies the changes since the rows were loaded; False means reload instead
+        latest_change_id, changed_rows, complete = get_grievance_changes(loaded['change_id'], hub_id=hub_id)
+        if latest_change_id == loaded['change_id']:
+            return True
+        if not complete or search_query: # Any change can reorder search results
+            return False
+        next_cursor = loaded['next_cursor']
+        rows_by_id = {row['id']: row for row in loaded['rows']}
+        for grievance_id, row in changed_rows.items():
+            if row is None:
+                rows_by_id.pop(grievance_id, None)
+            elif grievance_id in rows_by_id or next_cursor is None or (row['timestamp'], row['id']) > next_cursor:
+                rows_by_id[grievance_id] = row # Changed, or new and inside the loaded window
+        loaded['rows'] = sorted(rows_by_id.values(), key=lambda row: (row['timestamp'], row['id']), reverse=True)
+        loaded['change_id'] = latest_change_id
+        return True
+
+    def load_more_ledger_rows():
+        loaded = st.session_state.ledger_rows
+        page_rows, loaded['next_cursor'] = load_ledger_page(loaded['next_cursor'])
+        known_ids = {row['id'] for row in loaded['rows']}
+        # A new list: the loaded rows may still be the read cache's own first page, shared by every session
+        loaded['rows'] = loaded['rows'] + [row for row in page_rows if row['id'] not in known_ids]
+
+    seen_version = get_read_cache().data_version()
+    loaded = st.session_state.get("ledger_rows")
+    if loaded is None or loaded['key'] != (hub_id, page_size, search_query):
+        loaded = None
+    elif loaded['data_version'] != seen_version and not patch_ledger_rows(loaded):
+        loaded = None
+    if loaded is None:
+        change_id = get_latest_change_id() # Read first: a change racing the load gets applied again, not lost
+        rows, next_cursor = load_ledger_page(None)
+        loaded = {'key': (hub_id, page_size, search_query), 'rows': rows, 'next_cursor': next_cursor, 'change_id': change_id}
+        st.session_state.ledger_rows = loaded
+    loaded['data_version'] = seen_version
+    grievances = loaded['rows']
+    next_cursor = loaded['next_cursor']
+    live_refresh(seen_version, auto=st.session_state.get("ledger_view") != "🧮 Grid Editor")
+
+    if not grievances and search_query:
+        st.info(f"No love notes match '{search_query}', darling. Try other words? 🔎")
+    elif not grievances:
         st.info("No love notes (grievances) yet! Our hearts are in perfect sync. 🥰 Or, feel free to share if something comes up, my dear!")
     else:
-        # Convert list of dicts (from get_all_grievances) to DataFrame
-        df = pd.DataFrame(grievances) 
-        
-        st.subheader("All Our Love Notes:") 
-
-        # Iterate over DataFrame rows
-        for index, row in df.iterrows():
-            # Access columns as dictionary keys or Series attributes
-            expander_title = f"{row['status']} - **{row['title']}** (Severity: {row['severity']}) - Submitted: {row['submitted_on']}"
-            with st.expander(expander_title): 
-                st.markdown(f"**Category:** {row['category']}")
-                st.markdown(f"**Details:**\n\n{row['details']}")
-                st.markdown(f"**Target Resolution Date:** {row['target_resolution_date']}")
-                st.markdown(f"**Current Status:** {row['status']}")
-                current_resolution_notes = row['resolution_notes'] if pd.notna(row['resolution_notes']) else "" # Handle None/NaN
+        if search_query:
+            st.subheader(f"Love Notes Matching '{search_query}':")
+        else:
+            st.subheader("All Our Love Notes:") 
+
+        # Bulk triage: pick any number of the loaded notes and change or delete them all at once,
+        # in one transaction and one rerun. The form keeps picking from rerunning the page.
+        profiling.phase("ledger: bulk actions")
+        if st.toggle("🗂️ Bulk actions", key="ledger_bulk_mode"):
+            grievance_titles = {row['id']: f"{row['title']} ({row['status']})" for row in grievances if not row.get('archived')}
+            with st.form("bulk_actions_form", clear_on_submit=True):
+                selected_ids = st.multiselect(
+                    "Choose the love notes to update together:",
+                    list(grievance_titles),
+                    format_func=grievance_titles.get,
+                    placeholder="Pick one or more notes..."
+                )
+                bulk_status = st.selectbox("New status for all of them:", STATUS_OPTIONS)
+                bulk_notes = st.text_area(
+                    "My Thoughts/Our Resolution (optional):",
+                    placeholder="Leave empty to keep each note's own resolution notes...",
+                    height=100
+                )
+                apply_col, delete_col = st.columns(2)
+                apply_clicked = apply_col.form_submit_button("Update Selected 💖", use_container_width=True)
+                delete_clicked = delete_col.form_submit_button("Delete Selected 🗑️", type="secondary", use_container_width=True)
+
+            if (apply_clicked or delete_clicked) and not selected_ids:
+                st.error("Please pick at least one love note first, sweetheart. 💕")
+            elif apply_clicked:
+                updated = bulk_update_grievance_status(selected_ids, bulk_status, bulk_notes or None, hub_id=hub_id)
+                st.session_state.ledger_flash = ("success", f"{updated} love notes updated in one go! We're amazing together! 🎉")
+                st.rerun()
+            elif delete_clicked:
+                deleted = bulk_delete_grievances(selected_ids, hub_id=hub_id)
+                st.session_state.ledger_flash = ("warning", f"{deleted} love notes deleted. Hope they were resolved with oceans of love! ❤️")
+                st.rerun()
+
+        profiling.phase("ledger: render notes")
+        grid_mode = st.radio(
+            "How shall we look at them?",
+            ["💌 Note Cards", "🧮 Grid Editor"],
+            horizontal=True,
+            key="ledger_view"
+        ) == "🧮 Grid Editor"
+
+        if grid_mode:
+            # One data editor instead of a keyed widget set per note. Edits stay in the browser
+            # until saved; then only the rows that really changed are written, in one transaction.
+            grid_key = f"ledger_grid_{st.session_state.get('ledger_grid_version', 0)}"
+            grid_rows = [row for row in grievances if not row.get('archived')] # Archived notes are read-only
+            grid_snapshot = [
+                {'id': row['id'], 'status': row['status'], 'resolution_notes': row['resolution_notes'] or ""}
+                for row in grid_rows
+            ]
+
+            def save_grid_edits(snapshot, grid_key):
+                # Runs before the rerun, against the snapshot the user was actually editing, so rows
+                # that moved meanwhile (e.g. a new note at the top) can't be mixed up
+                edited_rows = st.session_state[grid_key]["edited_rows"]
+                edits = []
+                for position, changes in edited_rows.items():
+                    original = snapshot[int(position)]
+                    edited = {**original, **changes}
+                    edited['resolution_notes'] = edited['resolution_notes'] or ""
+                    if edited['status'] != original['status'] or edited['resolution_notes'] != original['resolution_notes']:
+                        edits.append(edited)
+                saved = update_grievances(edits, hub_id=hub_id)
+                st.session_state.ledger_grid_version = st.session_state.get('ledger_grid_version', 0) + 1 # Fresh, clean editor
+                st.session_state.ledger_flash = ("success", f"{saved} love notes updated from the grid! We're amazing together! 🎉")
+
+            with st.form("ledger_grid_form"):
+                st.data_editor(
+                    pd.DataFrame([
+                        {**snapshot_row, 'title': row['title'], 'category': row['category'], 'severity': row['severity'],
+                         'submitted_on': row['submitted_on'], 'target_resolution_date': row['target_resolution_date']}
+                        for snapshot_row, row in zip(grid_snapshot, grid_rows)
+                    ]),
+                    key=grid_key,
+                    hide_index=True,
+                    column_order=["title", "status", "resolution_notes", "category", "severity", "submitted_on", "target_resolution_date"],
+                    disabled=["title", "category", "severity", "submitted_on", "target_resolution_date"],
+                    column_config={
+                        "title": st.column_config.TextColumn("💖 Love Note"),
+                        "status": st.column_config.SelectboxColumn("Status", options=STATUS_OPTIONS, required=True),
+                        "resolution_notes": st.column_config.TextColumn("My Thoughts/Our Resolution"),
+                        "category": st.column_config.TextColumn("Category"),
+                        "severity": st.column_config.TextColumn("Severity"),
+                        "submitted_on": st.column_config.TextColumn("Submitted"),
+                        "target_resolution_date": st.column_config.TextColumn("Target Date"),
+                    }
+                )
+                st.form_submit_button(
+                    "Save Grid Changes 💖",
+                    on_click=save_grid_edits,
+                    args=(grid_snapshot, grid_key)
+                )
+        else:
+            for row in grievances:
+                expander_title = f"{row['status']} - **{row['title']}** (Severity: {row['severity']}) - Submitted: {row['submitted_on']}"
+                if row.get('archived'):
+                    expander_title = f"🗄️ {expander_title}"
+                # Stateful expander: its .open flag tells us whether to build the edit widgets at all
+                expander = st.expander(expander_title, key=f"expander_{row['id']}", on_change="rerun")
+                if not expander.open:
+                    continue
+                with expander: 
+                    st.markdown(f"**Category:** {row['category']}")
+                    st.markdown(f"**Details:**\n\n{row['details']}")
+                    st.markdown(f"**Target Resolution Date:** {row['target_resolution_date']}")
+                    st.markdown(f"**Current Status:** {row['status']}")
+                    if row.get('archived'):
+                        st.markdown(f"**Our Resolution:** {row['resolution_notes'] or ''}")
+                        st.caption("🗄️ This note is archived: resolved long ago and kept safe for memories.")
+                        continue
+                    current_resolution_notes = row['resolution_notes'] if row['resolution_notes'] is not None else "" # Handle None
                 
-                st.markdown("---")
-                st.markdown("#### Update This Note, My Love:") 
+                    st.markdown("---")
+                    st.markdown("#### Update This Note, My Love:") 
                 
-                col1, col2 = st.columns([3,1]) 
-                with col1:
-                    status_options = ["💖 Open", "💬 We're Talking", "🛠️ Working on it", "✅ Resolved with Love!", "⏳ Pending Apology Cuddles"]
-                    try:
-                        current_status_index = status_options.index(row['status'])
-                    except ValueError:
-                        current_status_index = 0 
-
-                    new_status = st.selectbox(
-                        "Update Status:", 
-                        status_options,
-                        index=current_status_index,
-                        key=f"status_{row['id']}" # Use 'id' from the row
-                    )
-                    resolution_notes_update = st.text_area(
-                        "My Thoughts/Our Resolution:", 
-                        value=current_resolution_notes,
-                        key=f"notes_{row['id']}", # Use 'id' from the row
-                        placeholder="How I'm making it better / Our beautiful resolution...",
-                        height=100
-                    )
+                    col1, col2 = st.columns([3,1]) 
+                    with col1:
+                        try:
+                            current_status_index = STATUS_OPTIONS.index(row['status'])
+                        except ValueError:
+                            current_status_index = 0 
+
+                        new_status = st.selectbox(
+                            "Update Status:", 
+                            STATUS_OPTIONS,
+                            index=current_status_index,
+                            key=f"status_{row['id']}" # Use 'id' from the row
+                        )
+                        resolution_notes_update = st.text_area(
+                            "My Thoughts/Our Resolution:", 
+                            value=current_resolution_notes,
+                            key=f"notes_{row['id']}", # Use 'id' from the row
+                            placeholder="How I'm making it better / Our beautiful resolution...",
+                            height=100
+                        )
                 
-                with col2:
-                    st.markdown("<br>", unsafe_allow_html=True) 
-                    if st.button("Save Update 💖", key=f"update_{row['id']}", use_container_width=True): # Use 'id'
-                        update_grievance_status(row['id'], new_status, resolution_notes_update) # Use 'id'
-                        st.success(f"Note '{row['title']}' updated! We're amazing together! 🎉")
-                        st.rerun() 
-
-                    st.markdown("<br>", unsafe_allow_html=True) 
-                    if st.button("Delete Note 🗑️", key=f"delete_{row['id']}", type="secondary", use_container_width=True): # Use 'id'
-                        delete_grievance(row['id']) # Use 'id'
-                        st.warning(f"Note '{row['title']}' deleted. Hope it was resolved with oceans of love! ❤️")
-                        st.rerun()
+                    with col2:
+                        st.markdown("<br>", unsafe_allow_html=True) 
+                        if st.button("Save Update 💖", key=f"update_{row['id']}", use_container_width=True): # Use 'id'
+                            update_grievance_status(row['id'], new_status, resolution_notes_update, hub_id=hub_id) # Use 'id'
+                            st.success(f"Note '{row['title']}' updated! We're amazing together! 🎉")
+                            st.rerun() 
+
+                        st.markdown("<br>", unsafe_allow_html=True) 
+                        if st.button("Delete Note 🗑️", key=f"delete_{row['id']}", type="secondary", use_container_width=True): # Use 'id'
+                            delete_grievance(row['id'], hub_id=hub_id) # Use 'id'
+                            st.warning(f"Note '{row['title']}' deleted. Hope it was resolved with oceans of love! ❤️")
+                            st.rerun()
+
+        if next_cursor is not None:
+            st.button("Load More Love Notes 💞", key="ledger_load_more", on_click=load_more_ledger_rows)
+        else:
+            if search_query:
+                st.caption(f"That's all {len(grievances)} matching love notes, darling! 💕")
+            else:
+                st.caption(f"That's all {len(grievances)} of our love notes, darling! 💕")
+
+elif app_mode == "⏰ Overdue & Due Soon":
+    profiling.phase("due: load")
+    st.header("⏰ What Needs Our Love First")
+    st.markdown("The notes whose target dates have slipped by, and the ones coming up this week. Let's keep our promises, sweetheart! 🤞")
+
+    # Counts and lists come straight off the due-date indexes; resolved notes never enter into it
+    DUE_LIST_LIMIT = 50
+    seen_version = get_read_cache().data_version()
+    today = today_ist()
+    due_counts = get_due_counts(today, hub_id=hub_id)
+    live_refresh(seen_version)
+
+    profiling.phase("due: render")
+    overdue_col, due_soon_col = st.columns(2)
+    overdue_col.metric("Overdue ⏰", due_counts['overdue'])
+    due_soon_col.metric(f"Due in the Next {DUE_SOON_DAYS} Days 🗓️", due_counts['due_soon'])
+
+    for due, label, empty_message in (
+        ("overdue", "Overdue Love Notes ⏰", "Nothing overdue! We're keeping every promise, my love. 🥰"),
+        ("due_soon", "Due This Week 🗓️", "Nothing due this week, darling. A little breather for us! 🌸"),
+    ):
+        st.markdown("---")
+        st.subheader(label)
+        due_rows, has_more = get_due_grievances(due, today, DUE_LIST_LIMIT, hub_id=hub_id)
+        if not due_rows:
+            st.info(empty_message)
+            continue
+        st.dataframe(
+            pd.DataFrame([
+                {'title': row['title'], 'status': row['status'], 'severity': row['severity'], 'category': row['category'],
+                 'target_resolution_date': row['target_resolution_date'],
+                 'days': (datetime.date.fromisoformat(row['target_resolution_date']) - today).days}
+                for row in due_rows
+            ]),
+            hide_index=True,
+            column_config={
+                "title": st.column_config.TextColumn("💖 Love Note"),
+                "status": st.column_config.TextColumn("Status"),
+                "severity": st.column_config.TextColumn("Severity"),
+                "category": st.column_config.TextColumn("Category"),
+                "target_resolution_date": st.column_config.TextColumn("Target Date"),
+                "days": st.column_config.NumberColumn("Days Left", help="Negative means it's that many days late"),
+            }
+        )
+        if has_more:
+            st.caption(f"Showing the {DUE_LIST_LIMIT} most pressing; update them in 📝 View & Manage Grievances.")
 
 elif app_mode == "📊 Our Love Stats":
+    profiling.phase("stats: load")
     st.header("📊 Our Love Stats Dashboard") 
     st.markdown("A little peek at how wonderfully we're growing, together. Every step forward is a testament to our love! 💑")
 
-    grievances_data = get_all_grievances() # Renamed to avoid conflict
-    if not grievances_data: 
+    seen_version = get_read_cache().data_version()
+    stats = get_grievance_stats(hub_id)
+    live_refresh(seen_version)
+    if stats['total'] == 0: 
         st.info("No grievances submitted yet to show any stats. Our love story is just beginning! 🕊️")
     else:
-        df_stats = pd.DataFrame(grievances_data) # Use a different df name for clarity
-
-        total_grievances = len(df_stats)
-        all_statuses = ["💖 Open", "💬 We're Talking", "🛠️ Working on it", "✅ Resolved with Love!", "⏳ Pending Apology Cuddles"]
-        # Ensure 'status' column exists before using it
-        if 'status' in df_stats.columns:
-            status_counts = df_stats['status'].value_counts().reindex(all_statuses, fill_value=0)
-            resolved_grievances = status_counts.get("✅ Resolved with Love!", 0)
-            ongoing_conversations = status_counts.loc[status_counts.index != "✅ Resolved with Love!"].sum()
-        else: # Handle case where 'status' column might be missing (e.g., if DB schema changed or data is malformed)
-            status_counts = pd.Series(0, index=all_statuses) # Empty series with correct index
-            resolved_grievances = 0
-            ongoing_conversations = 0
-            st.warning("Could not find status data for grievances. Please check database.")
-
+        total_grievances = stats['total']
+        status_counts = pd.Series(stats['status_counts'], dtype="int64").reindex(STATUS_OPTIONS, fill_value=0)
+        resolved_grievances = status_counts.get("✅ Resolved with Love!", 0)
+        ongoing_conversations = status_counts.loc[status_counts.index != "✅ Resolved with Love!"].sum()
 
+        profiling.phase("stats: render")
         col1, col2, col3 = st.columns(3)
         col1.metric("Total Love Notes 💌", total_grievances)
         col2.metric("Resolved with Love ✅", resolved_grievances)
         col3.metric("Ongoing Conversations 💬", ongoing_conversations)
 
+        # Promises on the calendar: unresolved notes past, or close to, their target dates
+        due_counts = get_due_counts(today_ist(), hub_id=hub_id)
+        overdue_col, due_soon_col = st.columns(2)
+        overdue_col.metric("Overdue ⏰", due_counts['overdue'])
+        due_soon_col.metric(f"Due in the Next {DUE_SOON_DAYS} Days 🗓️", due_counts['due_soon'])
+
 
         st.markdown("---")
         st.subheader("Status Breakdown:") 
@@ -531,15 +801,53 @@ elif app_mode == "📊 Our Love Stats":
 
         st.markdown("---")
         st.subheader("Category Insights:") 
-        if 'category' in df_stats.columns and not df_stats['category'].dropna().empty: # Use lowercase 'category'
-            category_counts = df_stats['category'].value_counts() # Use lowercase 'category'
-            if not category_counts.empty:
-                 st.bar_chart(category_counts, color="#FFC0CB") # Direct Hex for --accent-pink-light
-            else: 
-                st.info("No category data to display in the chart yet, darling! What are our love notes about? 🤔")
+        # Largest category first, same order value_counts() would give
+        category_counts = pd.Series(stats['category_counts'], dtype="int64").sort_values(ascending=False)
+        if not category_counts.empty:
+            st.bar_chart(category_counts, color="#FFC0CB") # Direct Hex for --accent-pink-light
         else:
             st.info("No category data to display in the chart yet, darling! What are our love notes about? 🤔")
 
+        st.markdown("---")
+        st.subheader("Our Love Over Time:")
+        # Read from the per-day rollup, so years of notes are a few hundred rows to chart
+        per_week = st.radio("Count love notes per:", ["Day", "Week"], horizontal=True, key="trend_granularity") == "Week"
+        daily_trends = pd.DataFrame(get_daily_trends(hub_id), columns=["day", "Opened 💌", "Resolved ✅"])
+        if not daily_trends.empty:
+            daily_trends["day"] = pd.to_datetime(daily_trends["day"])
+            # Quiet days have no rollup row; resampling fills them in with zeros
+            trend_counts = daily_trends.set_index("day").resample("W-MON", label="left", closed="left") if per_week else daily_trends.set_index("day").resample("D")
+            st.line_chart(trend_counts.sum(), color=["#FF69B4", "#8FBC8F"])
+        else:
+            st.info("Nothing to chart over time yet, sweetheart! 📈")
+
+        st.markdown("---")
+        st.subheader("How Quickly We Make Up (Median Days to Resolve):")
+        resolution_times = get_resolution_times(hub_id)
+        if resolution_times:
+            median_days = pd.Series(
+                {category: times['median_hours'] / 24 for category, times in resolution_times.items()}, dtype="float64"
+            ).sort_values()
+            st.bar_chart(median_days, color="#FF69B4")
+            st.caption(f"From {sum(times['resolved'] for times in resolution_times.values()):,} love notes resolved since we started timing them. Medians are estimated from time buckets, so they're close but not exact. ⏱️")
+        else:
+            st.info("No resolution times yet: they start counting the next time we resolve a love note together! ⏱️")
+
 # --- Footer ---
+profiling.phase("footer")
 st.markdown("---")
 st.markdown("<div class='footer-text'><p>Remember Sai Keerthi, communication is the melody of our happy hearts. I love you more each day! ❤️,Made By Rahul B Only for Sai Kee</p></div>", unsafe_allow_html=True)
+
+# --- Rerun Profile ---
+rerun_profile = profiling.finish_rerun()
+if rerun_profile is not None:
+    with st.sidebar.expander(f"⏱️ Rerun Profile ({rerun_profile['total_ms']:.0f} ms)"):
+        st.caption(f"{rerun_profile['db_ms']:.1f} ms in {len(rerun_profile['db_calls'])} DB calls · traced to {profiling.TRACE_FILE}")
+        st.dataframe(pd.DataFrame(rerun_profile['phases']), hide_index=True)
+        if rerun_profile['db_calls']:
+            st.dataframe(
+                pd.DataFrame([
+                    {**call, 'sql': "\n".join(call['sql'])} for call in rerun_profile['db_calls']
+                ])[['name', 'ms', 'rows', 'changes', 'cached', 'sql']],
+                hide_index=True
+            )
@@ -0,0 +1,237 @@
+import os
+import re
+import gzip
+import time
+import shutil
+import sqlite3
+import argparse
+import datetime
+import threading
+
+from database import DB_NAME, BUSY_TIMEOUT_MS, SCHEMA_VERSION, run_migrations, invalidate_read_cache
+
+# --- Backup Setup ---
+# Online backups of the live database: the sqlite3 backup API copies a few hundred pages per step
+# and lets go of the database in between, so writers keep working while a snapshot is taken.
+# Each snapshot is integrity-checked, gzipped and timestamped; only the newest few are kept.
+#
+#   python backup.py create            # take a snapshot now
+#   python backup.py list
+#   python backup.py restore backups/love_hub-20250520-135000.db.gz
+#
+# LOVE_HUB_BACKUP_EVERY_HOURS=6 streamlit run app.py also takes one every six hours in the background.
+BACKUP_DIR = os.environ.get("LOVE_HUB_BACKUP_DIR", "backups")
+BACKUP_KEEP = int(os.environ.get("LOVE_HUB_BACKUP_KEEP", "14")) # Snapshots kept; older ones are deleted
+BACKUP_EVERY_HOURS = float(os.environ.get("LOVE_HUB_BACKUP_EVERY_HOURS", "0")) # 0 = no scheduled backups
+BACKUP_PAGES_PER_STEP = 256 # Pages copied while holding the read lock
+BACKUP_STEP_SLEEP_S = 0.005 # Pause between steps, for writers to get in
+BACKUP_MAX_RESTARTS = 3 # Restarts tolerated before finishing in one step instead
+SNAPSHOT_PREFIX = "love_hub-"
+SNAPSHOT_PATTERN = re.compile(r"^love_hub-(\d{8}-\d{6})\.db\.gz$")
+
+_backup_lock = threading.Lock() # One snapshot at a time per process, whoever asks for it
+
+class _BackupStarved(Exception):
+    pass
+
+def _integrity_check(conn):
+    # Returns 'ok' or the problems PRAGMA integrity_check found
+    return "; ".join(row[0] for row in conn.execute("PRAGMA integrity_check").fetchall())
+
+def list_backups(backup_dir=None):
+    # Snapshot paths in backup_dir, newest first
+    backup_dir = backup_dir or BACKUP_DIR
+    if not os.path.isdir(backup_dir):
+        return []
+    names = sorted((name for name in os.listdir(backup_dir) if SNAPSHOT_PATTERN.match(name)), reverse=True)
+    return [os.path.join(backup_dir, name) for name in names]
+
+def _check_keep(keep):
+    # Keeping zero would delete the snapshot just taken
+    if keep < 1:
+        raise ValueError(f"Must keep at least 1 snapshot, not {keep}")
+    return keep
+
+def prune_backups(keep=None, backup_dir=None):
+    # Deletes all but the newest `keep` snapshots. Returns the paths deleted.
+    keep = _check_keep(BACKUP_KEEP if keep is None else keep)
+    expired = list_backups(backup_dir)[keep:]
+    for path in expired:
+        os.remove(path)
+    return expired
+
+def create_backup(db_name=None, backup_dir=None, keep=None):
+    # Takes a compressed snapshot of the live database and applies retention.
+    # Returns {'path', 'pages', 'steps', 'restarts', 'bytes', 'seconds'}.
+    db_name = db_name or DB_NAME
+    backup_dir = backup_dir or BACKUP_DIR
+    keep = _check_keep(BACKUP_KEEP if keep is None else keep) # Before any copying, not after
+    os.makedirs(backup_dir, exist_ok=True)
+    with _backup_lock:
+        started = time.perf_counter()
+        stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(backup_dir, f"{SNAPSHOT_PREFIX}{stamp}.db.gz")
+        staging_path = path[:-len(".gz")] + ".tmp"
+        steps = 0
+        restarts = 0
+        last_remaining = None
+
+        def progress(_status, remaining, _total):
+            nonlocal steps, restarts, last_remaining
+            steps += 1
+            if last_remaining is not None and remaining > last_remaining:
+                restarts += 1
+                if restarts > BACKUP_MAX_RESTARTS:
+                    raise _BackupStarved()
+            last_remaining = remaining
+
+        source = sqlite3.connect(db_name, timeout=BUSY_TIMEOUT_MS / 1000)
+        target = sqlite3.connect(staging_path)
+        try:
+            # A write from another connection between steps makes SQLite restart the copy, so the
+            # snapshot is always one consistent point in time. Under a steady stream of writes it
+            # would never finish, so after a few restarts the rest is copied in one step: in WAL
+            # mode that's a single read transaction, which writers don't wait on either.
+            try:
+                source.backup(target, pages=BACKUP_PAGES_PER_STEP, progress=progress, sleep=BACKUP_STEP_SLEEP_S)
+            except _BackupStarved:
+                source.backup(target, pages=-1)
+            target.execute("PRAGMA journal_mode=DELETE") # A self-contained file, no -wal next to it
+            pages = target.execute("PRAGMA page_count").fetchone()[0]
+            problems = _integrity_check(target)
+            if problems != "ok":
+                raise RuntimeError(f"Snapshot failed integrity_check: {problems}")
+        except BaseException:
+            target.close()
+            os.remove(staging_path)
+            raise
+        finally:
+            target.close()
+            source.close()
+
+        try:
+            with open(staging_path, "rb") as raw, gzip.open(path + ".part", "wb", compresslevel=6) as compressed:
+                shutil.copyfileobj(raw, compressed, 1024 * 1024)
+            os.replace(path + ".part", path) # Only complete snapshots ever carry the final name
+        finally:
+            os.remove(staging_path)
+        prune_backups(keep, backup_dir)
+        return {
+            'path': path,
+            'pages': pages,
+            'steps': steps,
+            'restarts': restarts,
+            'bytes': os.path.getsize(path),
+            'seconds': round(time.perf_counter() - started, 3),
+        }
+
+def _change_feed_high_water(conn):
+    # Highest change id ever handed out (the AUTOINCREMENT sequence), or 0 before the change feed existed
+    try:
+        return conn.execute("SELECT IFNULL(MAX(seq), 0) FROM sqlite_sequence WHERE name = 'grievance_changes'").fetchone()[0]
+    except sqlite3.OperationalError: # No sqlite_sequence at all yet
+        return 0
+
+def _restart_change_feed(db_name, past_change_id):
+    # A restore brings back the snapshot's change log and sequence, so change ids open sessions have
+    # already seen would be handed out again and their next poll would find nothing amiss. Instead
+    # the log is emptied and restarted with a single marker past every id either side has used:
+    # any session's last seen id is then older than the log reaches back, and it reloads.
+    conn = sqlite3.connect(db_name, timeout=BUSY_TIMEOUT_MS / 1000)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        marker_id = max(past_change_id, _change_feed_high_water(conn)) + 2 # +2 leaves a gap, so even the newest id looks pruned
+        conn.execute("DELETE FROM grievance_changes")
+        conn.execute("INSERT INTO grievance_changes (change_id, grievance_id, operation) VALUES (?, 0, 'restore')", (marker_id,))
+        conn.commit()
+    finally:
+        conn.close()
+
+def restore_backup(snapshot_path, db_name=None):
+    # Replaces the live database's contents with a snapshot. The snapshot is decompressed and
+    # integrity-checked first, then copied in through the backup API, so open connections simply
+    # see the restored data instead of a file swapped out from under them. Returns the migrations
+    # applied to bring an older snapshot up to date.
+    db_name = db_name or DB_NAME
+    staging_path = f"{db_name}.restore.tmp"
+    with gzip.open(snapshot_path, "rb") as compressed, open(staging_path, "wb") as raw:
+        shutil.copyfileobj(compressed, raw, 1024 * 1024)
+    try:
+        restored = sqlite3.connect(staging_path)
+        try:
+            problems = _integrity_check(restored)
+            if problems != "ok":
+                raise RuntimeError(f"{snapshot_path} failed integrity_check: {problems}")
+            version = restored.execute("PRAGMA user_version").fetchone()[0]
+            if version > SCHEMA_VERSION:
+                raise RuntimeError(f"{snapshot_path} has schema version {version}, newer than this app knows about ({SCHEMA_VERSION})")
+            live = sqlite3.connect(db_name, timeout=BUSY_TIMEOUT_MS / 1000)
+            try:
+                past_change_id = _change_feed_high_water(live)
+                restored.backup(live) # One step: holds the write lock until the whole copy is in
+                live.execute("PRAGMA journal_mode=WAL")
+                problems = _integrity_check(live)
+                if problems != "ok":
+                    raise RuntimeError(f"Restored database failed integrity_check: {problems}")
+            finally:
+                live.close()
+        finally:
+            restored.close()
+    finally:
+        os.remove(staging_path)
+    applied = run_migrations(db_name)
+    _restart_change_feed(db_name, past_change_id)
+    invalidate_read_cache()
+    return applied
+
+# --- Scheduled Backups ---
+_scheduler_started = False
+_scheduler_lock = threading.Lock()
+
+def _backup_loop(interval_s):
+    while True:
+        time.sleep(interval_s)
+        try:
+            create_backup()
+        except Exception as e: # Keep the schedule going; the next run may well succeed
+            print(f"Scheduled backup failed: {e}")
+
+def start_backup_scheduler(every_hours=None):
+    # Starts the background backup thread once per process; a no-op when no interval is configured
+    global _scheduler_started
+    every_hours = BACKUP_EVERY_HOURS if every_hours is None else every_hours
+    if _scheduler_started or every_hours <= 0:
+        return
+    with _scheduler_lock:
+        if not _scheduler_started:
+            threading.Thread(target=_backup_loop, args=(every_hours * 3600,), name="love-hub-backup", daemon=True).start()
+            _scheduler_started = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Back up and restore the Love Hub database.")
+    parser.add_argument("--db", default=None, help=f"Database file (default: {DB_NAME})")
+    parser.add_argument("--dir", default=None, help=f"Snapshot directory (default: {BACKUP_DIR})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    create = commands.add_parser("create", help="Take a snapshot now")
+    create.add_argument("--keep", type=int, default=None, help=f"Snapshots to keep (default: {BACKUP_KEEP})")
+    commands.add_parser("list", help="List snapshots, newest first")
+    restore = commands.add_parser("restore", help="Restore a snapshot into the database")
+    restore.add_argument("snapshot")
+    args = parser.parse_args()
+    if getattr(args, "keep", None) is not None and args.keep < 1:
+        parser.error("--keep must be at least 1")
+
+    if args.command == "create":
+        result = create_backup(args.db, args.dir, args.keep)
+        print(f"Wrote {result['path']} ({result['pages']:,} pages, {result['bytes'] / 1024:,.0f} KiB) in {result['seconds']:.2f}s")
+    elif args.command == "list":
+        for path in list_backups(args.dir):
+            print(f"{path}  {os.path.getsize(path) / 1024:,.0f} KiB")
+    elif args.command == "restore":
+        applied = restore_backup(args.snapshot, args.db)
+        print(f"Restored {args.snapshot}" + (f" and applied migrations {applied}" if applied else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# Compares the old per-row grievance loader with the vectorized DataFrame loader, and the old
+# list-of-dicts loader with get_all_grievances().
+#
+#   python benchmarks/bench_loader.py --rows 100000
+#
+# Seeds a throwaway database, then reports load time (best of --repeat runs), peak Python
+# allocations while loading, and the resident size of the resulting DataFrame (DataFrame loaders only).
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+database = None # Imported by main() once LOVE_HUB_DB points at the throwaway database
+
+
+def dicts_per_row():
+    # get_all_grievances() as it used to be: fetch rows, convert each timestamp with pytz
+    with database.get_db_connection() as conn:
+        grievances_raw = conn.execute(
+            "SELECT id, timestamp, title, details, category, severity, status, resolution_notes, target_resolution_date FROM grievances ORDER BY timestamp DESC"
+        ).fetchall()
+    return [database.process_grievance_row(row_raw) for row_raw in grievances_raw]
+
+
+def load_per_row():
+    # The DataFrame loader as it used to be: the per-row dicts, then build the frame
+    return pd.DataFrame(dicts_per_row())
+
+
+def load_vectorized():
+    return database.get_grievances_df()
+
+
+def dicts_current():
+    return database.get_all_grievances()
+
+
+COMPARISONS = (
+    ("per-row", load_per_row, "vectorized", load_vectorized),
+    ("dicts old", dicts_per_row, "dicts new", dicts_current),
+)
+
+
+def measure(loader, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        loader()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    loaded = loader()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    frame = int(loaded.memory_usage(deep=True).sum()) if isinstance(loaded, pd.DataFrame) else None
+    return best, peak, frame
+
+
+def run_comparisons(repeat):
+    for old_name, old_loader, new_name, new_loader in COMPARISONS:
+        results = {}
+        for name, loader in ((old_name, old_loader), (new_name, new_loader)):
+            results[name] = measure(loader, repeat)
+            seconds, peak, frame = results[name]
+            size = f"   DataFrame {frame / 2**20:8.1f} MiB" if frame is not None else ""
+            print(f"{name:>10}: {seconds * 1000:9.1f} ms   peak alloc {peak / 2**20:8.1f} MiB{size}")
+
+        (old_s, old_peak, old_frame), (new_s, new_peak, new_frame) = results[old_name], results[new_name]
+        size = f", {old_frame / new_frame:5.1f}x DataFrame size" if old_frame is not None else ""
+        print(f"   speedup: {old_s / new_s:5.1f}x time, {old_peak / new_peak:5.1f}x peak alloc{size}")
+
+
+def main():
+    global database
+    parser = argparse.ArgumentParser(description="Benchmark the old and current grievance loaders.")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="love_hub_bench_") as tmp_dir:
+        bench_db = os.path.join(tmp_dir, "bench_grievances.db")
+        os.environ["LOVE_HUB_DB"] = bench_db # Must be set before database is imported
+        import database
+        from synthetic_data import populate
+
+        print(f"Seeding {args.rows:,} grievances into {bench_db} ...")
+        populate(bench_db, args.rows)
+        try:
+            run_comparisons(args.repeat)
+        finally:
+            database.get_connection_pool().close_all() # Let go of the file before the directory goes
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+# Benchmark suite for the data helpers and full page renders, at several table sizes.
+#
+#   python benchmarks/bench_suite.py --sizes 10000 100000 --output bench_report.json
+#   python benchmarks/bench_suite.py --sizes 1000000 --repeat 3 --output bench_1m.json
+#   python benchmarks/bench_suite.py --compare bench_before.json bench_after.json
+#
+# Each size gets its own seeded synthetic database (see synthetic_data.py) and its own worker
+# process, so module-level pools and caches never leak between sizes. The JSON report records
+# the commit it ran against, so reports from two commits can be compared with --compare.
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+APP_PATH = os.path.join(REPO_DIR, "app.py")
+APP_MODES = ["💌 Submit New Grievance", "📝 View & Manage Grievances", "⏰ Overdue & Due Soon", "📊 Our Love Stats"]
+DEFAULT_SIZES = [10_000, 100_000]
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        "runs": len(samples),
+        "min_ms": round(samples[0] * 1000, 3),
+        "median_ms": round(statistics.median(samples) * 1000, 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 3),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+    }
+
+
+def time_calls(func, args_list):
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        func(*args)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def run_worker(repeat, seed):
+    # Runs inside a fresh process with LOVE_HUB_DB pointing at the seeded database
+    sys.path.insert(0, REPO_DIR)
+    import database
+    from streamlit.testing.v1 import AppTest
+
+    database.ensure_schema()
+    rng = random.Random(seed)
+    with database.get_db_connection() as conn:
+        ids = [row[0] for row in conn.execute("SELECT id FROM grievances")]
+    target_ids = rng.sample(ids, min(len(ids), repeat * 2))
+    today = datetime.date.today()
+
+    results = {}
+    results["get_all_grievances"] = time_calls(database.get_all_grievances, [()] * repeat)
+    # Cached helper: start each call cold, as the page would right after a write
+    results["get_due_counts"] = time_calls(
+        lambda day: database.invalidate_read_cache() or database.get_due_counts(day), [(today,)] * repeat
+    )
+    results["add_grievance"] = time_calls(database.add_grievance, [
+        (f"Benchmark note {i}", "Added by the benchmark suite.", rng.choice(database.CATEGORY_OPTIONS),
+         rng.choice(database.SEVERITY_OPTIONS), today + datetime.timedelta(days=7))
+        for i in range(repeat * 2)
+    ])
+    results["update_grievance_status"] = time_calls(database.update_grievance_status, [
+        (grievance_id, rng.choice(database.STATUS_OPTIONS), "Updated by the benchmark suite.")
+        for grievance_id in target_ids[:repeat]
+    ])
+    results["delete_grievance"] = time_calls(database.delete_grievance, [
+        (grievance_id,) for grievance_id in target_ids[repeat:]
+    ])
+
+    at = AppTest.from_file(APP_PATH, default_timeout=600)
+    at.run() # First run pays for imports and migrations; don't count it
+    for mode in APP_MODES:
+        cold, warm = [], []
+        for _ in range(repeat):
+            database.invalidate_read_cache() # Cold: as after a write, every read goes to SQLite
+            start = time.perf_counter()
+            at.sidebar.radio[0].set_value(mode).run()
+            cold.append(time.perf_counter() - start)
+            if at.exception:
+                raise RuntimeError(f"{mode} raised: {at.exception[0].value}")
+            start = time.perf_counter()
+            at.run() # Warm: a widget-only rerun served from the read cache
+            warm.append(time.perf_counter() - start)
+        results[f"render {mode}"] = summarize(cold)
+        results[f"render (cached) {mode}"] = summarize(warm)
+    return results
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def run_suite(sizes, repeat, seed):
+    from synthetic_data import populate
+    import pandas as pd
+    import streamlit
+
+    commit, dirty = git_revision()
+    report = {
+        "meta": {
+            "commit": commit,
+            "dirty": dirty,
+            "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "pandas": pd.__version__,
+            "streamlit": streamlit.__version__,
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "seed": seed,
+        },
+        "results": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="love_hub_bench_") as tmp_dir:
+        for size in sizes:
+            db_path = os.path.join(tmp_dir, f"bench_{size}.db")
+            print(f"[{size:,} rows] seeding ...", file=sys.stderr)
+            populate(db_path, size, seed)
+            print(f"[{size:,} rows] benchmarking ...", file=sys.stderr)
+            worker = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--worker", "--repeat", str(repeat), "--seed", str(seed)],
+                env={**os.environ, "LOVE_HUB_DB": db_path},
+                cwd=tmp_dir,
+                capture_output=True,
+                text=True,
+            )
+            if worker.returncode != 0:
+                sys.stderr.write(worker.stderr)
+                raise SystemExit(f"Benchmark worker failed for {size:,} rows")
+            report["results"][str(size)] = json.loads(worker.stdout.strip().splitlines()[-1])
+    return report
+
+
+def print_report(report):
+    for size, results in report["results"].items():
+        print(f"\n{int(size):,} rows")
+        for name, stats in results.items():
+            print(f"  {name:<48} median {stats['median_ms']:10.2f} ms   p95 {stats['p95_ms']:10.2f} ms")
+
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"before: {before['meta'].get('commit')}   after: {after['meta'].get('commit')}   (ratio = speedup, before / after)")
+    for size, after_results in after["results"].items():
+        before_results = before["results"].get(size, {})
+        print(f"\n{int(size):,} rows")
+        for name, stats in after_results.items():
+            if name not in before_results:
+                print(f"  {name:<48} {'(new)':>10}        -> {stats['median_ms']:10.2f} ms")
+                continue
+            old, new = before_results[name]["median_ms"], stats["median_ms"]
+            print(f"  {name:<48} {old:10.2f} ms -> {new:10.2f} ms   ({old / new if new else float('inf'):5.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Love Hub data helpers and page renders.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Table sizes to benchmark, e.g. 10000 100000 1000000")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per measurement")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Compare two JSON reports instead of running")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.repeat, args.seed)))
+        return
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = run_suite(args.sizes, args.repeat, args.seed)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
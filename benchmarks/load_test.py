@@ -0,0 +1,380 @@
+# Concurrent-session load test: how many people can one `streamlit run app.py` process serve
+# before rerun latency falls apart?
+#
+#   python benchmarks/load_test.py --rows 100000 --sessions 1 5 10 20 --duration 30
+#   python benchmarks/load_test.py --sessions 10 --mix submit=1 update=3 delete=1 stats=5 --output load.json
+#   python benchmarks/load_test.py --sessions 10 20 --write-queue
+#
+# Every simulated session is an AppTest driving the real app.py, each on its own thread, all in
+# one process - the same shape as a Streamlit server, which runs every session's script on its
+# own thread against one shared connection pool and read cache. Sessions loop over a weighted mix
+# of actions (submit a note, update or delete notes through the bulk form, view the stats) with
+# no think time unless asked, for a fixed duration. Runs entirely offline: no server, no browser.
+#
+# Each concurrency level gets a fresh copy of one seeded database (see synthetic_data.py) and its
+# own worker process. The report gives throughput, p50/p95/p99 rerun latency, and how often writes
+# found SQLite's single writer lock taken and how long they waited for it (as counted by
+# database.begin_write, which every write transaction opens with).
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+APP_PATH = os.path.join(REPO_DIR, "app.py")
+DEFAULT_SESSIONS = [1, 5, 10, 20]
+DEFAULT_MIX = {"submit": 20, "update": 30, "delete": 10, "stats": 40}
+SUBMIT_PAGE = "💌 Submit New Grievance"
+LEDGER_PAGE = "📝 View & Manage Grievances"
+STATS_PAGE = "📊 Our Love Stats"
+# The helpers that write, i.e. take SQLite's one writer lock for a transaction
+WRITE_HELPERS = ["add_grievance", "update_grievance_status", "bulk_update_grievance_status", "update_grievances", "delete_grievance", "bulk_delete_grievances"]
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    if not samples:
+        return {"count": 0}
+
+    def nearest_rank(p):
+        return round(samples[min(len(samples) - 1, max(0, int(len(samples) * p + 0.5) - 1))] * 1000, 3)
+
+    return {
+        "count": len(samples),
+        "p50_ms": nearest_rank(0.50),
+        "p95_ms": nearest_rank(0.95),
+        "p99_ms": nearest_rank(0.99),
+        "max_ms": round(samples[-1] * 1000, 3),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+    }
+
+
+def parse_mix(pairs):
+    mix = {}
+    for pair in pairs:
+        name, _, weight = pair.partition("=")
+        if name not in DEFAULT_MIX or not weight:
+            raise argparse.ArgumentTypeError(f"Bad --mix entry {pair!r}; use e.g. submit=20 ({', '.join(DEFAULT_MIX)})")
+        mix[name] = float(weight)
+    return mix
+
+
+# --- Worker: runs inside a fresh process with LOVE_HUB_DB pointing at its own copy ---
+class WriteOverlapMonitor:
+    # Wraps the write helpers to see how they overlap. An overlapping write started while another
+    # helper call was still in flight; it may have waited on the writer lock, a pooled connection
+    # or the write queue. Real lock waits come from database.write_lock_stats instead.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.writes = 0
+        self.overlapping_writes = 0
+        self.busy_errors = 0
+        self.alone = []
+        self.overlapping = []
+
+    def wrap(self, func):
+        def wrapper(*args, **kwargs):
+            with self._lock:
+                overlapping = self._in_flight > 0
+                self._in_flight += 1
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if "locked" in str(e):
+                    with self._lock:
+                        self.busy_errors += 1
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self._in_flight -= 1
+                    self.writes += 1
+                    self.overlapping_writes += overlapping
+                    (self.overlapping if overlapping else self.alone).append(elapsed)
+        return wrapper
+
+
+class Session:
+    # One simulated user: an AppTest plus everything measured about its reruns
+    def __init__(self, index, seed, hub_id, mix, think_s):
+        from streamlit.testing.v1 import AppTest
+        self.rng = random.Random(seed + index)
+        self.mix_names = list(mix)
+        self.mix_weights = list(mix.values())
+        self.think_s = think_s
+        self.at = AppTest.from_file(APP_PATH, default_timeout=600)
+        self.at.query_params["hub"] = hub_id
+        self.reruns = []
+        self.actions = {name: [] for name in mix}
+        self.errors = []
+
+    def rerun(self):
+        start = time.perf_counter()
+        self.at.run()
+        self.reruns.append(time.perf_counter() - start)
+        for exception in self.at.exception:
+            self.errors.append(exception.value)
+        return not self.at.exception
+
+    def go_to(self, page):
+        radio = self.at.sidebar.radio[0]
+        if radio.value != page:
+            radio.set_value(page)
+            return self.rerun()
+        return True
+
+    def button(self, label):
+        return next(button for button in self.at.button if button.label == label)
+
+    def submit(self):
+        import database
+        if not self.go_to(SUBMIT_PAGE):
+            return
+        self.at.text_input[0].input(f"Load test note {self.rng.randrange(10 ** 9)}")
+        self.at.text_area[0].input("Sent by the load test.")
+        self.at.selectbox[0].set_value(self.rng.choice(database.CATEGORY_OPTIONS))
+        self.at.selectbox[1].set_value(self.rng.choice(database.SEVERITY_OPTIONS))
+        self.button("Send with All My Love 💌").click()
+        self.rerun()
+
+    def bulk_action(self, label, status=None):
+        # Picks one to three of the notes this session has loaded, through the ledger's bulk form
+        if not self.go_to(LEDGER_PAGE):
+            return
+        bulk_toggle = self.at.toggle(key="ledger_bulk_mode")
+        if not bulk_toggle.value:
+            bulk_toggle.set_value(True)
+            if not self.rerun():
+                return
+        loaded = self.at.session_state["ledger_rows"]["rows"] if "ledger_rows" in self.at.session_state else []
+        ids = [row['id'] for row in loaded if not row.get('archived')]
+        if not ids:
+            return
+        self.at.multiselect[0].set_value(self.rng.sample(ids, min(len(ids), self.rng.randint(1, 3))))
+        if status is not None:
+            next(box for box in self.at.selectbox if box.label == "New status for all of them:").set_value(status)
+        self.button(label).click()
+        self.rerun()
+
+    def update(self):
+        import database
+        self.bulk_action("Update Selected 💖", self.rng.choice(database.STATUS_OPTIONS))
+
+    def delete(self):
+        self.bulk_action("Delete Selected 🗑️")
+
+    def stats(self):
+        if self.at.sidebar.radio[0].value == STATS_PAGE:
+            self.rerun() # Already there: a refresh
+        else:
+            self.go_to(STATS_PAGE)
+
+    def run(self, start_barrier, started, duration_s):
+        start_barrier.wait() # Everyone starts together; the barrier stamps the start time
+        deadline = started["at"] + duration_s
+        while time.perf_counter() < deadline:
+            name = self.rng.choices(self.mix_names, self.mix_weights)[0]
+            start = time.perf_counter()
+            getattr(self, name)()
+            self.actions[name].append(time.perf_counter() - start)
+            if self.think_s:
+                time.sleep(self.think_s)
+
+
+def run_worker(sessions, duration_s, mix, seed, hub_id, think_ms):
+    sys.path.insert(0, REPO_DIR)
+    import database
+
+    database.ensure_schema()
+    monitor = WriteOverlapMonitor()
+    for name in WRITE_HELPERS:
+        # app.py imports the helpers by name on every rerun, so it picks up the wrapped ones
+        setattr(database, name, monitor.wrap(getattr(database, name)))
+
+    simulated = [Session(index, seed, hub_id, mix, think_ms / 1000) for index in range(sessions)]
+    for session in simulated:
+        session.at.run() # First runs pay for imports and migrations; don't count them
+        if session.at.exception:
+            raise RuntimeError(f"app.py raised on its first run: {session.at.exception[0].value}")
+
+    started = {}
+    start_barrier = threading.Barrier(sessions, action=lambda: started.setdefault("at", time.perf_counter()))
+    threads = [
+        threading.Thread(target=session.run, args=(start_barrier, started, duration_s), name=f"load-session-{index}")
+        for index, session in enumerate(simulated)
+    ]
+    pool = database.get_connection_pool()
+    pool_waits_before = pool.waits
+    lock_before = database.write_lock_stats.snapshot()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed_s = time.perf_counter() - started["at"]
+    lock_after = database.write_lock_stats.snapshot()
+    lock_waits = lock_after["waits"] - lock_before["waits"]
+    lock_wait_samples = lock_after["wait_seconds"][-lock_waits:] if lock_waits else [] # Only the newest LOCK_WAIT_SAMPLES are kept
+
+    reruns = [sample for session in simulated for sample in session.reruns]
+    actions = {name: [sample for session in simulated for sample in session.actions[name]] for name in mix}
+    errors = [error for session in simulated for error in session.errors]
+    completed = sum(len(samples) for samples in actions.values())
+    return {
+        "sessions": sessions,
+        "seconds": round(elapsed_s, 3),
+        "actions": completed,
+        "actions_per_s": round(completed / elapsed_s, 2),
+        "reruns_per_s": round(len(reruns) / elapsed_s, 2),
+        "rerun": percentiles(reruns),
+        "by_action": {name: percentiles(samples) for name, samples in actions.items()},
+        "writes": monitor.writes,
+        "lock_waits": lock_waits,
+        "lock_wait": percentiles(lock_wait_samples),
+        "lock_timeouts": lock_after["timeouts"] - lock_before["timeouts"],
+        "overlapping_writes": monitor.overlapping_writes,
+        "busy_errors": monitor.busy_errors,
+        "write_alone": percentiles(monitor.alone),
+        "write_overlapping": percentiles(monitor.overlapping),
+        "pool_waits": pool.waits - pool_waits_before,
+        "errors": len(errors),
+        "error_samples": sorted(set(errors))[:5],
+    }
+
+
+# --- Driver ---
+def copy_database(source_path, target_path):
+    # Through the backup API, so the copy includes anything still sitting in the WAL
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+def run_load_test(rows, session_counts, duration_s, mix, seed, hub_id, think_ms, write_queue):
+    from synthetic_data import populate
+    from bench_suite import git_revision
+    import streamlit
+
+    commit, dirty = git_revision()
+    report = {
+        "meta": {
+            "commit": commit,
+            "dirty": dirty,
+            "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "streamlit": streamlit.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "rows": rows,
+            "duration_s": duration_s,
+            "mix": mix,
+            "think_ms": think_ms,
+            "write_queue": write_queue,
+            "seed": seed,
+        },
+        "results": [],
+    }
+    worker_env = {
+        **os.environ,
+        "LOVE_HUB_WRITE_QUEUE": "1" if write_queue else "0",
+        "LOVE_HUB_BACKUP_EVERY_HOURS": "0", # No snapshots stealing time mid-run
+        "STREAMLIT_BROWSER_GATHER_USAGE_STATS": "false",
+    }
+    worker_env.pop("LOVE_HUB_PROFILE", None)
+    with tempfile.TemporaryDirectory(prefix="love_hub_load_") as tmp_dir:
+        seed_path = os.path.join(tmp_dir, "seed.db")
+        print(f"Seeding {rows:,} rows ...", file=sys.stderr)
+        populate(seed_path, rows, seed, hub_id)
+        for sessions in session_counts:
+            db_path = os.path.join(tmp_dir, f"load_{sessions}.db")
+            copy_database(seed_path, db_path)
+            print(f"[{sessions} sessions] running for {duration_s}s ...", file=sys.stderr)
+            worker = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--worker", "--sessions", str(sessions), "--duration", str(duration_s),
+                 "--mix", *(f"{name}={weight}" for name, weight in mix.items()), "--seed", str(seed), "--hub", hub_id,
+                 "--think-ms", str(think_ms)],
+                env={**worker_env, "LOVE_HUB_DB": db_path},
+                cwd=tmp_dir,
+                capture_output=True,
+                text=True,
+            )
+            if worker.returncode != 0:
+                sys.stderr.write(worker.stderr)
+                raise SystemExit(f"Load test worker failed with {sessions} sessions")
+            report["results"].append(json.loads(worker.stdout.strip().splitlines()[-1]))
+    return report
+
+
+def print_report(report, p99_budget_ms=None):
+    meta = report["meta"]
+    print(f"{meta['rows']:,} rows, {meta['duration_s']}s per level, mix {meta['mix']}" + (", write queue on" if meta["write_queue"] else ""))
+    print(f"{'sessions':>8} {'actions/s':>10} {'reruns/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'writes':>7} {'lock waits':>11} {'wait p95 ms':>12} {'busy':>5} {'pool waits':>11} {'errors':>7}")
+    for result in report["results"]:
+        rerun = result["rerun"]
+        print(f"{result['sessions']:>8} {result['actions_per_s']:>10.1f} {result['reruns_per_s']:>9.1f} "
+              f"{rerun.get('p50_ms', 0):>9.1f} {rerun.get('p95_ms', 0):>9.1f} {rerun.get('p99_ms', 0):>9.1f} "
+              f"{result['writes']:>7} {result['lock_waits']:>11} {result['lock_wait'].get('p95_ms', 0):>12.1f} {result['busy_errors']:>5} {result['pool_waits']:>11} {result['errors']:>7}")
+        for sample in result["error_samples"]:
+            print(f"{'':>8}   error: {sample}")
+    # Degraded: p99 over the budget, which defaults to twice the p99 at the lowest concurrency
+    measured = [result for result in report["results"] if result["rerun"].get("count")]
+    if not measured:
+        return
+    if p99_budget_ms is None and len(measured) < 2:
+        print("\nOnly one level measured; pass --p99-budget-ms to judge it.") # Its own p99 can't be its baseline
+        return
+    budget_ms = p99_budget_ms or 2 * measured[0]["rerun"]["p99_ms"]
+    degraded = next((result for result in measured if result["rerun"]["p99_ms"] > budget_ms), None)
+    if degraded is None:
+        print(f"\np99 stayed within {budget_ms:.0f} ms up to {measured[-1]['sessions']} sessions.")
+    else:
+        print(f"\np99 first went over {budget_ms:.0f} ms at {degraded['sessions']} sessions ({degraded['rerun']['p99_ms']:.0f} ms).")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the Love Hub with many concurrent simulated sessions.")
+    parser.add_argument("--rows", type=int, default=100_000, help="Notes in the seeded database")
+    parser.add_argument("--sessions", type=int, nargs="+", default=DEFAULT_SESSIONS, help="Concurrent sessions per level, e.g. 1 5 10 20")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds of load per level")
+    parser.add_argument("--mix", nargs="+", default=None, metavar="ACTION=WEIGHT",
+                        help=f"Action weights (default: {' '.join(f'{name}={weight}' for name, weight in DEFAULT_MIX.items())})")
+    parser.add_argument("--think-ms", type=float, default=0, help="Pause after each action, per session")
+    parser.add_argument("--hub", default="default", help="Hub the sessions work in")
+    parser.add_argument("--write-queue", action="store_true", help="Run with LOVE_HUB_WRITE_QUEUE=1")
+    parser.add_argument("--p99-budget-ms", type=float, default=None, help="Report where p99 passes this (default: 2x the p99 at the lowest level)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    mix = parse_mix(args.mix) if args.mix else DEFAULT_MIX
+
+    if args.worker:
+        print(json.dumps(run_worker(args.sessions[0], args.duration, mix, args.seed, args.hub, args.think_ms), ensure_ascii=False))
+        return
+
+    report = run_load_test(args.rows, args.sessions, args.duration, mix, args.seed, args.hub, args.think_ms, args.write_queue)
+    print_report(report, args.p99_budget_ms)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# Seeded synthetic grievances for benchmarking the app at scale.
+#
+#   python benchmarks/synthetic_data.py --rows 100000 --db /tmp/love_bench.db
+#
+# Rows follow the app's own option lists with skewed, believable distributions: most notes are
+# mild, older notes are far more likely to be resolved, text lengths vary a lot, and timestamps
+# are spread over several years. The same --seed always produces the same data.
+import argparse
+import datetime
+import math
+import os
+import random
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import CATEGORY_OPTIONS, SEVERITY_OPTIONS, STATUS_OPTIONS, RESOLVED_STATUS, DEFAULT_HUB_ID, normalize_hub_id, run_migrations # noqa: E402
+from import_export import bulk_insert_rows # noqa: E402
+
+CATEGORY_WEIGHTS = [22, 20, 15, 14, 8, 12, 5, 4] # Same order as CATEGORY_OPTIONS
+SEVERITY_WEIGHTS = [65, 28, 7] # Same order as SEVERITY_OPTIONS
+RESOLUTION_MEDIAN_HOURS = [96, 36, 6] # Same order as SEVERITY_OPTIONS: emergencies get sorted out fastest
+OPEN_STATUSES = [status for status in STATUS_OPTIONS if status != RESOLVED_STATUS]
+
+WORDS = (
+    "love time together texts morning night dinner chores dishes laundry movie weekend plans "
+    "trip cuddles call hug listen phone late sorry promise surprise flowers date walk coffee "
+    "family friends birthday gift remember forgot quiet talk feelings heart sweet little big"
+).split()
+
+CHUNK_SIZE = 50_000
+GENERATED_COLUMNS = ['hub_id', 'timestamp', 'title', 'details', 'category', 'severity', 'status', 'resolution_notes', 'target_resolution_date', 'resolved_at']
+
+
+def _sentence(rng, min_words, max_words):
+    words = rng.choices(WORDS, k=rng.randint(min_words, max_words))
+    return " ".join(words).capitalize()
+
+
+def _text(rng, median_words):
+    # Log-normal lengths: mostly short, with the occasional long heartfelt essay
+    n_words = max(1, min(int(rng.lognormvariate(0, 0.8) * median_words), median_words * 20))
+    return _sentence(rng, n_words, n_words) + "."
+
+
+def generate_grievances(rows, seed=42, years=3, end=None):
+    # Yields grievance tuples: (timestamp, title, details, category, severity, status,
+    # resolution_notes, target_resolution_date, resolved_at), timestamps as SQLite-style UTC strings
+    rng = random.Random(seed)
+    # Resolution times come from their own stream, so the other columns stay what this seed always gave
+    resolution_rng = random.Random(seed + 1)
+    end = end or datetime.datetime(2025, 6, 1)
+    span_seconds = int(years * 365 * 86400)
+    for _ in range(rows):
+        age_seconds = rng.randrange(span_seconds)
+        submitted = end - datetime.timedelta(seconds=age_seconds)
+        # The older the note, the likelier it's resolved by now
+        resolved_chance = min(0.95, 0.2 + age_seconds / span_seconds)
+        if rng.random() < resolved_chance:
+            status = RESOLVED_STATUS
+        else:
+            status = rng.choice(OPEN_STATUSES)
+        has_notes = status != "💖 Open" and rng.random() < 0.8
+        title = _sentence(rng, 2, 8)
+        details = _text(rng, 25)
+        category = rng.choices(CATEGORY_OPTIONS, CATEGORY_WEIGHTS)[0]
+        severity = rng.choices(SEVERITY_OPTIONS, SEVERITY_WEIGHTS)[0]
+        resolved_at = None
+        if status == RESOLVED_STATUS:
+            median_hours = RESOLUTION_MEDIAN_HOURS[SEVERITY_OPTIONS.index(severity)]
+            hours = resolution_rng.lognormvariate(math.log(median_hours), 1.2)
+            resolved_at = min(submitted + datetime.timedelta(hours=hours), end).strftime("%Y-%m-%d %H:%M:%S")
+        yield (
+            submitted.strftime("%Y-%m-%d %H:%M:%S"),
+            title,
+            details,
+            category,
+            severity,
+            status,
+            _text(rng, 15) if has_notes else None,
+            (submitted.date() + datetime.timedelta(days=rng.randint(1, 30))).isoformat(),
+            resolved_at,
+        )
+
+
+def populate(db_path, rows, seed=42, hub_id=DEFAULT_HUB_ID):
+    # Creates/migrates the database at db_path and appends `rows` synthetic grievances to the hub
+    run_migrations(db_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA synchronous=OFF") # Throwaway benchmark data: skip fsyncs while loading
+    try:
+        rows_iter = generate_grievances(rows, seed)
+        while True:
+            chunk = [(hub_id,) + row for _, row in zip(range(CHUNK_SIZE), rows_iter)]
+            if not chunk:
+                break
+            bulk_insert_rows(conn, chunk, GENERATED_COLUMNS) # Set-wise stats/search/change-feed upkeep, not per-row triggers
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill a Love Hub database with seeded synthetic grievances.")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--db", required=True, help="Database file to create or append to")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--hub", default=DEFAULT_HUB_ID, help="Hub to add them to (default: %(default)s)")
+    args = parser.parse_args()
+    populate(args.db, args.rows, args.seed, normalize_hub_id(args.hub))
+    print(f"Added {args.rows:,} synthetic grievances to hub '{args.hub}' in {args.db}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1433 @@
+import sqlite3
+import threading
+import contextlib
+import concurrent.futures
+import queue
+import atexit
+import collections
+import functools
+import datetime
+import os
+import re
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import pytz # Import the pytz library for timezone conversion
+from profiling import PROFILING_ENABLED, traced_db_call, record_sql, record_changes
+
+# --- Grievance Options ---
+# The choices offered by the app's forms; anything importing or generating data should stick to these
+CATEGORY_OPTIONS = ["Quality Time 🕰️", "Communication 🗣️", "Chores & Responsibilities 🧹", "Appreciation & Affection 🥰", "Future Plans 🌟", "Little Annoyances 🤏", "Date Night Ideas ✨", "Other Sweet Nothings 🤔"]
+SEVERITY_OPTIONS = ["🥺 Mild Heartache", "😥 Needs Prompt Attention", "😭 Emergency Snuggle Protocol!"]
+STATUS_OPTIONS = ["💖 Open", "💬 We're Talking", "🛠️ Working on it", "✅ Resolved with Love!", "⏳ Pending Apology Cuddles"]
+RESOLVED_STATUS = "✅ Resolved with Love!"
+
+# --- Database Setup ---
+DB_NAME = os.environ.get("LOVE_HUB_DB", "love_grievances.db") # Overridable so tools can point at a scratch copy
+
+# --- Hubs ---
+# One database can hold many hubs; every helper takes the hub it works on, defaulting to this one
+DEFAULT_HUB_ID = "default"
+HUB_ID_PATTERN = re.compile(r"[a-z0-9][a-z0-9_-]{0,63}")
+
+def normalize_hub_id(hub_id):
+    # Lower-cased, validated hub id (e.g. from a ?hub= URL parameter); raises ValueError if it isn't one
+    hub_id = (hub_id or DEFAULT_HUB_ID).strip().lower()
+    if not HUB_ID_PATTERN.fullmatch(hub_id):
+        raise ValueError(f"{hub_id!r} isn't a valid hub id (letters, digits, '-' and '_', up to 64 characters)")
+    return hub_id
+
+BUSY_TIMEOUT_MS = 5000 # How long a connection waits on a locked database before giving up
+MAX_POOL_CONNECTIONS = 8
+
+class ConnectionPool:
+    # A small thread-safe pool of SQLite connections shared by every session in this process.
+    # Streamlit runs each session's script in its own thread, so a connection is checked out by
+    # exactly one thread at a time and handed back when its 'with' block ends.
+    def __init__(self, db_name, max_connections=MAX_POOL_CONNECTIONS, busy_timeout_ms=BUSY_TIMEOUT_MS):
+        self.db_name = db_name
+        self.max_connections = max_connections
+        self.busy_timeout_ms = busy_timeout_ms
+        self._idle = []
+        self._created = 0
+        self._available = threading.Condition()
+        self.waits = 0 # Checkouts that found every connection in use and had to queue for one
+
+    def _open(self):
+        conn = sqlite3.connect(
+            self.db_name,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False, # Safe: the pool never lets two threads hold the same connection
+            cached_statements=256, # Prepared statements are reused for as long as the connection lives
+        )
+        conn.row_factory = sqlite3.Row # Allows accessing columns by name
+        # WAL lets readers carry on while a writer commits; NORMAL is still crash-safe under WAL
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        if PROFILING_ENABLED:
+            conn.set_trace_callback(record_sql) # Lets the profiler show the SQL behind each helper call
+        return conn
+
+    def _acquire(self):
+        with self._available:
+            if not self._idle and self._created >= self.max_connections:
+                self.waits += 1
+            while not self._idle and self._created >= self.max_connections:
+                if not self._available.wait(timeout=self.busy_timeout_ms / 1000):
+                    raise sqlite3.OperationalError("Timed out waiting for a free database connection")
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+        try:
+            return self._open()
+        except Exception:
+            with self._available:
+                self._created -= 1
+                self._available.notify()
+            raise
+
+    def _release(self, conn, discard=False):
+        if not discard:
+            try:
+                if conn.in_transaction:
+                    conn.rollback() # Never hand the next caller someone else's half-done transaction
+            except sqlite3.Error:
+                discard = True # A connection that can't even roll back shouldn't go back into the pool
+        with self._available:
+            if discard:
+                self._created -= 1
+            else:
+                self._idle.append(conn)
+            self._available.notify()
+        if discard:
+            conn.close()
+
+    @contextlib.contextmanager
+    def connection(self):
+        conn = self._acquire()
+        changes_before = conn.total_changes if PROFILING_ENABLED else 0
+        try:
+            yield conn
+        finally:
+            if PROFILING_ENABLED:
+                record_changes(conn.total_changes - changes_before)
+            self._release(conn) # Rolls back anything left uncommitted, e.g. after an exception
+
+    def close_all(self):
+        with self._available:
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+        for conn in idle:
+            conn.close()
+
+_connection_pool = None
+_connection_pool_lock = threading.Lock()
+
+def get_connection_pool():
+    # This module is imported once per process (Streamlit only re-executes app.py on reruns),
+    # so every session shares the one pool created here.
+    global _connection_pool
+    if _connection_pool is None:
+        with _connection_pool_lock:
+            if _connection_pool is None:
+                _connection_pool = ConnectionPool(DB_NAME)
+    return _connection_pool
+
+def get_db_connection():
+    # Use as 'with get_db_connection() as conn:' - the connection goes back to the pool afterwards
+    return get_connection_pool().connection()
+
+# --- Write Lock ---
+# SQLite lets one transaction write at a time. Every write transaction opens with begin_write(),
+# which first asks for the lock without waiting: only when another connection holds it does it
+# fall back to waiting up to the busy timeout. That makes each real wait on the lock visible -
+# counted and timed here - rather than hidden inside SQLite's busy handler.
+LOCK_WAIT_SAMPLES = 10_000 # Most recent wait times kept, for percentiles
+
+class WriteLockStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.acquired = 0 # Write transactions started
+        self.waits = 0 # ... that found the lock taken and had to wait for it
+        self.timeouts = 0 # ... and gave up after the busy timeout ('database is locked')
+        self.wait_seconds = collections.deque(maxlen=LOCK_WAIT_SAMPLES)
+
+    def record(self, waited_s=None, timed_out=False):
+        with self._lock:
+            if waited_s is not None:
+                self.waits += 1
+                self.wait_seconds.append(waited_s)
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.acquired += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {'acquired': self.acquired, 'waits': self.waits, 'timeouts': self.timeouts, 'wait_seconds': list(self.wait_seconds)}
+
+write_lock_stats = WriteLockStats()
+
+def begin_write(conn, busy_timeout_ms=BUSY_TIMEOUT_MS):
+    # BEGIN IMMEDIATE on conn, recording in write_lock_stats whether (and how long) it waited for the lock
+    conn.execute("PRAGMA busy_timeout=0")
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        write_lock_stats.record()
+        return
+    except sqlite3.OperationalError as e:
+        if e.sqlite_errorcode != sqlite3.SQLITE_BUSY:
+            raise
+    finally:
+        conn.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+    started = time.perf_counter()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+    except sqlite3.OperationalError as e:
+        write_lock_stats.record(time.perf_counter() - started, timed_out=e.sqlite_errorcode == sqlite3.SQLITE_BUSY)
+        raise
+    write_lock_stats.record(time.perf_counter() - started)
+
+# --- Read Cache ---
+READ_CACHE_MAX_ENTRIES = 256
+
+class ReadCache:
+    # Results of read queries (ledger pages, stats, ...) keyed by the database's data version.
+    # The version is a local counter bumped by our own write helpers plus SQLite's
+    # 'PRAGMA data_version' on a dedicated watcher connection, which changes whenever any other
+    # connection - another session, another process - commits. A rerun that only touches widgets
+    # therefore costs one PRAGMA instead of a query. Least recently used entries are evicted
+    # beyond max_entries. Cached values are shared by every session, so treat them as read-only.
+    def __init__(self, db_name, max_entries=READ_CACHE_MAX_ENTRIES):
+        self.db_name = db_name
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._local_version = 0
+        self._watcher = None
+        self._lock = threading.Lock()
+
+    def data_version(self):
+        with self._lock:
+            if self._watcher is None:
+                self._watcher = sqlite3.connect(self.db_name, check_same_thread=False) # Only used under self._lock
+            return (self._local_version, self._watcher.execute("PRAGMA data_version").fetchone()[0])
+
+    def invalidate(self):
+        with self._lock:
+            self._local_version += 1
+            self._entries.clear()
+
+    def get_or_load(self, key, loader):
+        version = self.data_version()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        # Load outside the lock; a write that lands meanwhile bumps the version, so a stale
+        # result stored under the old version is never served
+        value = loader()
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+_read_cache = None
+_read_cache_lock = threading.Lock()
+
+def get_read_cache():
+    global _read_cache
+    if _read_cache is None:
+        with _read_cache_lock:
+            if _read_cache is None:
+                _read_cache = ReadCache(DB_NAME)
+    return _read_cache
+
+def invalidate_read_cache():
+    # Call after every commit that changes grievances
+    get_read_cache().invalidate()
+
+def cached_read(func):
+    # Serve func(*args) from the read cache while the data version is unchanged
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key = (func.__name__, args, tuple(sorted(kwargs.items())))
+        return get_read_cache().get_or_load(key, lambda: func(*args, **kwargs))
+    return wrapper
+
+# --- Write Queue (group commit) ---
+# Opt-in write-behind mode: LOVE_HUB_WRITE_QUEUE=1. Single-row writes from every session are
+# handed to one writer thread, which commits whatever has queued up as one transaction. Many
+# concurrent submitters then share one fsync instead of taking turns on SQLite's write lock.
+# A caller still blocks until its own write has committed, so nothing is acknowledged early.
+WRITE_QUEUE_ENABLED = os.environ.get("LOVE_HUB_WRITE_QUEUE") == "1"
+WRITE_QUEUE_MAX_SIZE = 1000 # Pending writes beyond this make callers wait (backpressure)
+WRITE_BATCH_MAX = 200 # Most writes committed together in one transaction
+
+_STOP = object()
+
+class WriteQueue:
+    def __init__(self, db_name, max_size=WRITE_QUEUE_MAX_SIZE, max_batch=WRITE_BATCH_MAX, busy_timeout_ms=BUSY_TIMEOUT_MS):
+        self.db_name = db_name
+        self.max_batch = max_batch
+        self.busy_timeout_ms = busy_timeout_ms
+        self.batches_committed = 0
+        self.writes_committed = 0
+        self._queue = queue.Queue(maxsize=max_size)
+        self._closed = False
+        self._close_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="love-hub-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, sql, params=()):
+        # Queues one write and waits until it has committed. Returns the statement's rowcount and
+        # lastrowid; re-raises whatever SQLite raised for this write.
+        done = concurrent.futures.Future()
+        with self._close_lock:
+            if self._closed:
+                raise sqlite3.OperationalError("The write queue has shut down")
+            try:
+                self._queue.put((sql, params, done), timeout=self.busy_timeout_ms / 1000)
+            except queue.Full:
+                raise sqlite3.OperationalError("Too many writes waiting; please try again in a moment") from None
+        if PROFILING_ENABLED:
+            record_sql(sql) # The statement runs on the writer thread, out of the profiler's sight
+        return done.result()
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_name, timeout=self.busy_timeout_ms / 1000)
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        # FULL: every group commit is fsync'd before anyone is told their write is safe. One
+        # fsync per batch rather than per write is what makes this cheaper than writing directly.
+        conn.execute("PRAGMA synchronous=FULL")
+        try:
+            stopping = False
+            while not stopping:
+                batch = [self._queue.get()]
+                while len(batch) < self.max_batch:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if _STOP in batch:
+                    stopping = True
+                    batch = [item for item in batch if item is not _STOP]
+                if batch:
+                    self._commit_batch(conn, batch)
+        finally:
+            conn.close()
+
+    def _commit_batch(self, conn, batch):
+        results = []
+        try:
+            begin_write(conn, self.busy_timeout_ms)
+            for sql, params, _done in batch:
+                # A savepoint per write: one bad write fails on its own, not the whole batch
+                conn.execute("SAVEPOINT queued_write")
+                try:
+                    cursor = conn.execute(sql, params)
+                    results.append((cursor.rowcount, cursor.lastrowid))
+                    conn.execute("RELEASE queued_write")
+                except sqlite3.Error as e:
+                    conn.execute("ROLLBACK TO queued_write")
+                    conn.execute("RELEASE queued_write")
+                    results.append(e)
+            conn.commit()
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.rollback()
+            for _sql, _params, done in batch:
+                done.set_exception(e)
+            return
+
+        self.batches_committed += 1
+        self.writes_committed += sum(1 for result in results if not isinstance(result, Exception))
+        invalidate_read_cache()
+        for (_sql, _params, done), result in zip(batch, results):
+            if isinstance(result, Exception):
+                done.set_exception(result)
+            else:
+                done.set_result(result)
+
+    def close(self):
+        # Stops taking writes, lets the writer commit everything already queued, then waits for it
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+
+_write_queue = None
+_write_queue_lock = threading.Lock()
+
+def get_write_queue():
+    global _write_queue
+    if _write_queue is None:
+        with _write_queue_lock:
+            if _write_queue is None:
+                _write_queue = WriteQueue(DB_NAME)
+                atexit.register(_write_queue.close) # Drain before the process exits
+    return _write_queue
+
+def execute_write(sql, params=()):
+    # Runs one write statement and commits it, through the write queue when that's enabled.
+    # Returns (rowcount, lastrowid).
+    if WRITE_QUEUE_ENABLED:
+        result = get_write_queue().submit(sql, params)
+    else:
+        with get_db_connection() as conn:
+            begin_write(conn)
+            cursor = conn.cursor()
+            cursor.execute(sql, params)
+            conn.commit()
+            result = (cursor.rowcount, cursor.lastrowid)
+        invalidate_read_cache()
+    return result
+
+# --- Schema Migrations ---
+# Each migration runs exactly once per database, in order; PRAGMA user_version records the last
+# one applied. Add new migrations to the end of MIGRATIONS - never edit or reorder applied ones.
+# Databases created before migrations existed (user_version 0) may already have some of these
+# objects, so the early migrations are written to be safe to re-run.
+MIGRATION_LOCK_TIMEOUT_S = 60 # A big backfill can hold the write lock for a while
+
+def _migrate_grievances_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS grievances (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP, -- Stored as UTC by SQLite default
+            title TEXT NOT NULL,
+            details TEXT,
+            category TEXT,
+            severity TEXT,
+            status TEXT DEFAULT '💖 Open',
+            resolution_notes TEXT,
+            submitted_by TEXT DEFAULT 'My Love ❤️',
+            target_resolution_date DATE
+        )
+    """)
+
+def _migrate_ledger_and_stats_indexes(cursor):
+    # Backs the keyset pagination on the ledger: (timestamp, id) is the page cursor
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_grievances_timestamp_id ON grievances (timestamp, id)")
+    # Let the stats GROUP BYs walk a small index instead of the whole table
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_grievances_status ON grievances (status)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_grievances_category ON grievances (category)")
+
+def _migrate_grievance_stats_rollup(cursor):
+    # Rollup of grievance counts per status/category/severity, kept current by the triggers below,
+    # so the dashboard reads a handful of rows however big the table gets. NULLs are stored as ''
+    # because NULLs never collide in a primary key.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS grievance_stats (
+            status TEXT NOT NULL DEFAULT '',
+            category TEXT NOT NULL DEFAULT '',
+            severity TEXT NOT NULL DEFAULT '',
+            n INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (status, category, severity)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_grievance_stats_insert AFTER INSERT ON grievances
+        BEGIN
+            INSERT INTO grievance_stats (status, category, severity, n)
+            VALUES (IFNULL(NEW.status, ''), IFNULL(NEW.category, ''), IFNULL(NEW.severity, ''), 1)
+            ON CONFLICT (status, category, severity) DO UPDATE SET n = n + 1;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_grievance_stats_update AFTER UPDATE OF status, category, severity ON grievances
+        BEGIN
+            UPDATE grievance_stats SET n = n - 1
+            WHERE status = IFNULL(OLD.status, '') AND category = IFNULL(OLD.category, '') AND severity = IFNULL(OLD.severity, '');
+            DELETE FROM grievance_stats
+            WHERE status = IFNULL(OLD.status, '') AND category = IFNULL(OLD.category, '') AND severity = IFNULL(OLD.severity, '') AND n <= 0;
+            INSERT INTO grievance_stats (status, category, severity, n)
+            VALUES (IFNULL(NEW.status, ''), IFNULL(NEW.category, ''), IFNULL(NEW.severity, ''), 1)
+            ON CONFLICT (status, category, severity) DO UPDATE SET n = n + 1;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_grievance_stats_delete AFTER DELETE ON grievances
+        BEGIN
+            UPDATE grievance_stats SET n = n - 1
+            WHERE status = IFNULL(OLD.status, '') AND category = IFNULL(OLD.category, '') AND severity = IFNULL(OLD.severity, '');
+            DELETE FROM grievance_stats
+            WHERE status = IFNULL(OLD.status, '') AND category = IFNULL(OLD.category, '') AND severity = IFNULL(OLD.severity, '') AND n <= 0;
+        END
+    """)
+    # Seed the rollup from the rows already there
+    cursor.execute("DELETE FROM grievance_stats")
+    cursor.execute("""
+        INSERT INTO grievance_stats (status, category, severity, n)
+        SELECT IFNULL(status, ''), IFNULL(category, ''), IFNULL(severity, ''), COUNT(*)
+        FROM grievances
+        GROUP BY 1, 2, 3
+    """)
+
+def _migrate_full_text_search(cursor):
+    # Full-text index over the free-text columns. It's an external-content FTS5 table, so it
+    # stores only the index and reads the text back from grievances; the triggers keep it in sync.
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS grievances_fts USING fts5(
+            title, details, resolution_notes,
+            content='grievances', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3' -- Prefix indexes keep as-you-type ("word*") lookups fast
+        )
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_grievances_fts_insert AFTER INSERT ON grievances
+        BEGIN
+            INSERT INTO grievances_fts (rowid, title, details, resolution_notes)
+            VALUES (NEW.id, NEW.title, NEW.details, NEW.resolution_notes);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_grievances_fts_update AFTER UPDATE OF title, details, resolution_notes ON grievances
+        BEGIN
+            INSERT INTO grievances_fts (grievances_fts, rowid, title, details, resolution_notes)
+            VALUES ('delete', OLD.id, OLD.title, OLD.details, OLD.resolution_notes);
+            INSERT INTO grievances_fts (rowid, title, details, resolution_notes)
+            VALUES (NEW.id, NEW.title, NEW.details, NEW.resolution_notes);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_grievances_fts_delete AFTER DELETE ON grievances
+        BEGIN
+            INSERT INTO grievances_fts (grievances_fts, rowid, title, details, resolution_notes)
+            VALUES ('delete', OLD.id, OLD.title, OLD.details, OLD.resolution_notes);
+        END
+    """)
+    # Backfill the index from every existing grievance
+    cursor.execute("INSERT INTO grievances_fts (grievances_fts) VALUES ('rebuild')")
+
+CHANGE_LOG_RETENTION = 10_000 # Changes kept in grievance_changes; sessions further behind just reload
+
+def _migrate_change_feed(cursor):
+    # Append-only log of which grievance changed, filled by triggers, so open sessions can
+    # fetch just the rows that changed since the last change they saw
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS grievance_changes (
+            change_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            grievance_id INTEGER NOT NULL,
+            operation TEXT NOT NULL, -- 'insert', 'update' or 'delete'
+            changed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    for operation, event, row in (("insert", "INSERT", "NEW"), ("update", "UPDATE", "NEW"), ("delete", "DELETE", "OLD")):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_grievance_changes_{operation} AFTER {event} ON grievances
+            BEGIN
+                INSERT INTO grievance_changes (grievance_id, operation) VALUES ({row}.id, '{operation}');
+            END
+        """)
+    # Every thousandth change trims the log back to the retention window
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_grievance_changes_prune AFTER INSERT ON grievance_changes
+        WHEN NEW.change_id % 1000 = 0
+        BEGIN
+            DELETE FROM grievance_changes WHERE change_id <= NEW.change_id - {CHANGE_LOG_RETENTION};
+        END
+    """)
+
+def _migrate_grievance_archive(cursor):
+    # Cold storage for long-resolved grievances, so the ledger's working set stays small.
+    # Rows keep their id when archived; grievance_stats and the search index cover both tables.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS grievances_archive (
+            id INTEGER PRIMARY KEY,
+            timestamp DATETIME,
+            title TEXT NOT NULL,
+            details TEXT,
+            category TEXT,
+            severity TEXT,
+            status TEXT,
+            resolution_notes TEXT,
+            submitted_by TEXT,
+            target_resolution_date DATE,
+            archived_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_grievance_stats_archive_insert AFTER INSERT ON grievances_archive
+        BEGIN
+            INSERT INTO grievance_stats (status, category, severity, n)
+            VALUES (IFNULL(NEW.status, ''), IFNULL(NEW.category, ''), IFNULL(NEW.severity, ''), 1)
+            ON CONFLICT (status, category, severity) DO UPDATE SET n = n + 1;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_grievance_stats_archive_delete AFTER DELETE ON grievances_archive
+        BEGIN
+            UPDATE grievance_stats SET n = n - 1
+            WHERE status = IFNULL(OLD.status, '') AND category = IFNULL(OLD.category, '') AND severity = IFNULL(OLD.severity, '');
+            DELETE FROM grievance_stats
+            WHERE status = IFNULL(OLD.status, '') AND category = IFNULL(OLD.category, '') AND severity = IFNULL(OLD.severity, '') AND n <= 0;
+        END
+    """)
+    # Hot and archived rows under one name, for search and anything else that wants both
+    cursor.execute("""
+        CREATE VIEW IF NOT EXISTS grievances_all AS
+        SELECT id, timestamp, title, details, category, severity, status, resolution_notes, target_resolution_date, 0 AS archived
+        FROM grievances
+        UNION ALL
+        SELECT id, timestamp, title, details, category, severity, status, resolution_notes, target_resolution_date, 1 AS archived
+        FROM grievances_archive
+    """)
+    # Point the search index at the view. FTS5 can't change its content table in place, so it's
+    # recreated and rebuilt; the triggers on grievances only refer to it by name and carry on.
+    cursor.execute("DROP TABLE IF EXISTS grievances_fts")
+    cursor.execute("""
+        CREATE VIRTUAL TABLE grievances_fts USING fts5(
+            title, details, resolution_notes,
+            content='grievances_all', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_grievances_fts_archive_insert AFTER INSERT ON grievances_archive
+        BEGIN
+            INSERT INTO grievances_fts (rowid, title, details, resolution_notes)
+            VALUES (NEW.id, NEW.title, NEW.details, NEW.resolution_notes);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_grievances_fts_archive_delete AFTER DELETE ON grievances_archive
+        BEGIN
+            INSERT INTO grievances_fts (grievances_fts, rowid, title, details, resolution_notes)
+            VALUES ('delete', OLD.id, OLD.title, OLD.details, OLD.resolution_notes);
+        END
+    """)
+    cursor.execute("INSERT INTO grievances_fts (grievances_fts) VALUES ('rebuild')")
+    # Archiving picks resolved rows by age
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_grievances_status_timestamp ON grievances (status, timestamp)")
+
+def _migrate_hubs(cursor):
+    # Many hubs in one database: every grievance belongs to a hub, and everything the app reads is
+    # looked up by hub first, so a hub's pages and stats cost what that hub holds, not the whole file.
+    # Rows from before hubs existed land in the default hub.
+    for table in ("grievances", "grievances_archive"):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN hub_id TEXT NOT NULL DEFAULT '{DEFAULT_HUB_ID}'")
+    cursor.execute("ALTER TABLE grievance_changes ADD COLUMN hub_id TEXT")
+
+    # Hub-first versions of the ledger and archiving indexes. The category index only served the
+    # GROUP BYs the stats rollup replaced, so it goes rather than being carried over.
+    for index in ("idx_grievances_timestamp_id", "idx_grievances_status", "idx_grievances_category", "idx_grievances_status_timestamp"):
+        cursor.execute(f"DROP INDEX IF EXISTS {index}")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_grievances_hub_timestamp_id ON grievances (hub_id, timestamp, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_grievances_hub_status_timestamp ON grievances (hub_id, status, timestamp)")
+
+    # The rollup gets hub_id in its key: rebuilt under the new shape, with its triggers redone to match
+    cursor.execute("""
+        CREATE TABLE grievance_stats_by_hub (
+            hub_id TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT '',
+            category TEXT NOT NULL DEFAULT '',
+            severity TEXT NOT NULL DEFAULT '',
+            n INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (hub_id, status, category, severity)
+        ) WITHOUT ROWID
+    """)
+    # Triggers still pointing at the old table would fail the rename, so they go first
+    for name in ("trg_grievance_stats_insert", "trg_grievance_stats_update", "trg_grievance_stats_delete",
+                 "trg_grievance_stats_archive_insert", "trg_grievance_stats_archive_delete"):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    cursor.execute("DROP TABLE grievance_stats")
+    cursor.execute("ALTER TABLE grievance_stats_by_hub RENAME TO grievance_stats")
+    cursor.execute("""
+        INSERT INTO grievance_stats (hub_id, status, category, severity, n)
+        SELECT hub_id, IFNULL(status, ''), IFNULL(category, ''), IFNULL(severity, ''), COUNT(*)
+        FROM (
+            SELECT hub_id, status, category, severity FROM grievances
+            UNION ALL
+            SELECT hub_id, status, category, severity FROM grievances_archive
+        )
+        GROUP BY 1, 2, 3, 4
+    """)
+    count_up = """
+        INSERT INTO grievance_stats (hub_id, status, category, severity, n)
+        VALUES (NEW.hub_id, IFNULL(NEW.status, ''), IFNULL(NEW.category, ''), IFNULL(NEW.severity, ''), 1)
+        ON CONFLICT (hub_id, status, category, severity) DO UPDATE SET n = n + 1;
+    """
+    count_down = """
+        UPDATE grievance_stats SET n = n - 1
+        WHERE hub_id = OLD.hub_id AND status = IFNULL(OLD.status, '') AND category = IFNULL(OLD.category, '') AND severity = IFNULL(OLD.severity, '');
+        DELETE FROM grievance_stats
+        WHERE hub_id = OLD.hub_id AND status = IFNULL(OLD.status, '') AND category = IFNULL(OLD.category, '') AND severity = IFNULL(OLD.severity, '') AND n <= 0;
+    """
+    stats_triggers = [
+        ("trg_grievance_stats_insert", "AFTER INSERT ON grievances", count_up),
+        ("trg_grievance_stats_update", "AFTER UPDATE OF hub_id, status, category, severity ON grievances", count_down + count_up),
+        ("trg_grievance_stats_delete", "AFTER DELETE ON grievances", count_down),
+        ("trg_grievance_stats_archive_insert", "AFTER INSERT ON grievances_archive", count_up),
+        ("trg_grievance_stats_archive_delete", "AFTER DELETE ON grievances_archive", count_down),
+    ]
+    for name, event, body in stats_triggers:
+        cursor.execute(f"CREATE TRIGGER {name} {event} BEGIN {body} END")
+
+    # The change feed records the hub too, so a session only ever fetches its own hub's changes
+    for operation, event, row in (("insert", "INSERT", "NEW"), ("update", "UPDATE", "NEW"), ("delete", "DELETE", "OLD")):
+        cursor.execute(f"DROP TRIGGER IF EXISTS trg_grievance_changes_{operation}")
+        cursor.execute(f"""
+            CREATE TRIGGER trg_grievance_changes_{operation} AFTER {event} ON grievances
+            BEGIN
+                INSERT INTO grievance_changes (grievance_id, operation, hub_id) VALUES ({row}.id, '{operation}', {row}.hub_id);
+            END
+        """)
+
+    cursor.execute("DROP VIEW IF EXISTS grievances_all")
+    cursor.execute("""
+        CREATE VIEW grievances_all AS
+        SELECT id, hub_id, timestamp, title, details, category, severity, status, resolution_notes, target_resolution_date, 0 AS archived
+        FROM grievances
+        UNION ALL
+        SELECT id, hub_id, timestamp, title, details, category, severity, status, resolution_notes, target_resolution_date, 1 AS archived
+        FROM grievances_archive
+    """)
+
+UNRESOLVED_STATUS_CONDITION = f"status != '{RESOLVED_STATUS}'" # Spelled out, so queries match the partial index below
+
+def _migrate_due_dates(cursor):
+    # Due dates get looked up directly instead of found by eyeballing every note: per-status counts
+    # range-scan (hub_id, status, target_resolution_date), and the overdue / due-soon lists walk a
+    # partial index holding only the notes that aren't resolved yet, which stays small however many
+    # resolved notes pile up.
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_grievances_hub_status_target ON grievances (hub_id, status, target_resolution_date)")
+    cursor.execute(f"""
+        CREATE INDEX IF NOT EXISTS idx_grievances_unresolved_target ON grievances (hub_id, target_resolution_date, id)
+        WHERE {UNRESOLVED_STATUS_CONDITION}
+    """)
+
+# --- Trend Rollups ---
+# Calendar days are IST days. India has had no daylight saving since 1945, so a fixed offset
+# turns a stored UTC timestamp into its IST date right inside SQLite.
+IST_DAY_SQL = "date({}, '+330 minutes')"
+# Time-to-resolution is counted into buckets that grow by a factor of sqrt(2), from half an hour up
+# to a few years, so the median can be read off a few dozen counts per category instead of every note.
+# Bucket 0 is everything under the first bound; the last bucket is open-ended.
+RESOLUTION_BUCKET_HOURS = [2 ** (k / 2) for k in range(-2, 31)]
+
+def resolution_bucket_sql(timestamp, resolved_at):
+    # SQL for the bucket of one note's time-to-resolution. A CASE over fixed bounds rather than
+    # log2(), which not every SQLite build ships with.
+    whens = " ".join(f"WHEN hours < {bound!r} THEN {bucket}" for bucket, bound in enumerate(RESOLUTION_BUCKET_HOURS))
+    return (f"(SELECT CASE {whens} ELSE {len(RESOLUTION_BUCKET_HOURS)} END "
+            f"FROM (SELECT (julianday({resolved_at}) - julianday({timestamp})) * 24 AS hours))")
+
+# Fresh trend rollups for the rows of `source` (a table, or a subquery in parentheses)
+GRIEVANCE_DAILY_COUNT_SQL = f"""
+    SELECT hub_id, day, SUM(opened) AS opened, SUM(resolved) AS resolved
+    FROM (
+        SELECT hub_id, {IST_DAY_SQL.format('timestamp')} AS day, 1 AS opened, 0 AS resolved FROM {{source}}
+        UNION ALL
+        SELECT hub_id, {IST_DAY_SQL.format('resolved_at')} AS day, 0 AS opened, 1 AS resolved FROM {{source}} WHERE resolved_at IS NOT NULL
+    )
+    GROUP BY 1, 2
+"""
+GRIEVANCE_RESOLUTION_COUNT_SQL = f"""
+    SELECT hub_id, IFNULL(category, '') AS category, {resolution_bucket_sql('timestamp', 'resolved_at')} AS bucket, COUNT(*) AS n
+    FROM {{source}} WHERE resolved_at IS NOT NULL
+    GROUP BY 1, 2, 3
+"""
+
+def _migrate_trends(cursor):
+    # When a note was resolved, and two rollups kept current by triggers for the trend charts:
+    # notes opened and resolved per hub and IST day, and time-to-resolution buckets per hub and
+    # category. A chart over years of notes reads a few hundred rollup rows, never the notes.
+    # Notes resolved before resolved_at existed have no time to count, so they stay out of the latter.
+    for table in ("grievances", "grievances_archive"):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN resolved_at TIMESTAMP")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS grievance_daily (
+            hub_id TEXT NOT NULL,
+            day TEXT NOT NULL,
+            opened INTEGER NOT NULL DEFAULT 0,
+            resolved INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (hub_id, day)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS grievance_resolution_times (
+            hub_id TEXT NOT NULL,
+            category TEXT NOT NULL DEFAULT '',
+            bucket INTEGER NOT NULL,
+            n INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (hub_id, category, bucket)
+        ) WITHOUT ROWID
+    """)
+    # Every note so far counts as opened on its day; none has a resolved_at yet, so that's all there is to seed
+    all_notes = "(SELECT hub_id, timestamp, resolved_at FROM grievances UNION ALL SELECT hub_id, timestamp, resolved_at FROM grievances_archive)"
+    cursor.execute(f"INSERT INTO grievance_daily (hub_id, day, opened, resolved) {GRIEVANCE_DAILY_COUNT_SQL.format(source=all_notes)}")
+
+    def count_up(row):
+        return f"""
+            INSERT INTO grievance_daily (hub_id, day, opened, resolved)
+            VALUES ({row}.hub_id, {IST_DAY_SQL.format(row + '.timestamp')}, 1, 0)
+            ON CONFLICT (hub_id, day) DO UPDATE SET opened = opened + 1;
+            INSERT INTO grievance_daily (hub_id, day, opened, resolved)
+            SELECT {row}.hub_id, {IST_DAY_SQL.format(row + '.resolved_at')}, 0, 1 WHERE {row}.resolved_at IS NOT NULL
+            ON CONFLICT (hub_id, day) DO UPDATE SET resolved = resolved + 1;
+            INSERT INTO grievance_resolution_times (hub_id, category, bucket, n)
+            SELECT {row}.hub_id, IFNULL({row}.category, ''), {resolution_bucket_sql(row + '.timestamp', row + '.resolved_at')}, 1 WHERE {row}.resolved_at IS NOT NULL
+            ON CONFLICT (hub_id, category, bucket) DO UPDATE SET n = n + 1;
+        """
+
+    def count_down(row):
+        return f"""
+            UPDATE grievance_daily SET opened = opened - 1
+            WHERE hub_id = {row}.hub_id AND day = {IST_DAY_SQL.format(row + '.timestamp')};
+            UPDATE grievance_daily SET resolved = resolved - 1
+            WHERE {row}.resolved_at IS NOT NULL AND hub_id = {row}.hub_id AND day = {IST_DAY_SQL.format(row + '.resolved_at')};
+            DELETE FROM grievance_daily
+            WHERE hub_id = {row}.hub_id AND day IN ({IST_DAY_SQL.format(row + '.timestamp')}, {IST_DAY_SQL.format(row + '.resolved_at')}) AND opened <= 0 AND resolved <= 0;
+            UPDATE grievance_resolution_times SET n = n - 1
+            WHERE {row}.resolved_at IS NOT NULL AND hub_id = {row}.hub_id AND category = IFNULL({row}.category, '')
+                AND bucket = {resolution_bucket_sql(row + '.timestamp', row + '.resolved_at')};
+            DELETE FROM grievance_resolution_times
+            WHERE hub_id = {row}.hub_id AND category = IFNULL({row}.category, '') AND n <= 0;
+        """
+
+    trend_triggers = [
+        ("trg_grievance_trends_insert", "AFTER INSERT ON grievances", count_up("NEW")),
+        ("trg_grievance_trends_update", "AFTER UPDATE OF hub_id, timestamp, category, resolved_at ON grievances", count_down("OLD") + count_up("NEW")),
+        ("trg_grievance_trends_delete", "AFTER DELETE ON grievances", count_down("OLD")),
+        ("trg_grievance_trends_archive_insert", "AFTER INSERT ON grievances_archive", count_up("NEW")),
+        ("trg_grievance_trends_archive_delete", "AFTER DELETE ON grievances_archive", count_down("OLD")),
+    ]
+    for name, event, body in trend_triggers:
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END")
+
+MIGRATIONS = [
+    # (user_version after applying, description, function(cursor))
+    (1, "grievances table", _migrate_grievances_table),
+    (2, "ledger and stats indexes", _migrate_ledger_and_stats_indexes),
+    (3, "grievance_stats rollup", _migrate_grievance_stats_rollup),
+    (4, "full-text search", _migrate_full_text_search),
+    (5, "change feed", _migrate_change_feed),
+    (6, "grievance archive", _migrate_grievance_archive),
+    (7, "hubs", _migrate_hubs),
+    (8, "due date indexes", _migrate_due_dates),
+    (9, "resolution times and trend rollups", _migrate_trends),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def run_migrations(db_name=None):
+    # Applies every pending migration in one transaction and returns the versions applied.
+    # BEGIN EXCLUSIVE doubles as the cross-process lock: parallel workers queue up behind it, and
+    # whoever goes second re-reads user_version and finds nothing left to do.
+    conn = sqlite3.connect(db_name or DB_NAME, timeout=MIGRATION_LOCK_TIMEOUT_S)
+    try:
+        # Only takes on a brand-new file, and only before anything writes its header - switching to
+        # WAL does - so it goes first; older files need enable_incremental_vacuum()
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL") # Can't change inside a transaction, so do it before BEGIN
+        cursor = conn.cursor()
+        cursor.execute("BEGIN EXCLUSIVE")
+        current_version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        if current_version > SCHEMA_VERSION:
+            raise RuntimeError(f"Database schema version {current_version} is newer than this app knows about ({SCHEMA_VERSION})")
+        applied = []
+        for version, _description, migrate in MIGRATIONS:
+            if version > current_version:
+                migrate(cursor)
+                applied.append(version)
+        if applied:
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}") # Transactional, like the DDL above
+        conn.commit()
+        return applied
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+def ensure_schema():
+    # Cheap enough to call on every Streamlit rerun: migrations run on the first call in
+    # this process and every later call is just a flag check.
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if not _schema_ready:
+            if run_migrations():
+                invalidate_read_cache()
+            _schema_ready = True
+
+# Fresh counts straight from the grievances and archive tables, the way the rollup should read.
+# {hub_filter} is empty for every hub, or narrows the counts to :hub_id.
+GRIEVANCE_STATS_COUNT_SQL = """
+    SELECT hub_id, IFNULL(status, '') AS status, IFNULL(category, '') AS category, IFNULL(severity, '') AS severity, COUNT(*) AS n
+    FROM (
+        SELECT hub_id, status, category, severity FROM grievances {hub_filter}
+        UNION ALL
+        SELECT hub_id, status, category, severity FROM grievances_archive {hub_filter}
+    )
+    GROUP BY 1, 2, 3, 4
+"""
+
+# Recomputes the rollup from those counts
+GRIEVANCE_STATS_REBUILD_SQL = f"INSERT INTO grievance_stats (hub_id, status, category, severity, n) {GRIEVANCE_STATS_COUNT_SQL}"
+
+@traced_db_call
+def rebuild_grievance_stats(verify_only=False, hub_id=None):
+    # Compares the rollup with a fresh count from grievances (and the archive) and, unless verify_only, rewrites it,
+    # for one hub or (hub_id=None) every hub.
+    # Returns the drift found as a list of dicts (hub_id, status, category, severity, expected, actual).
+    hub_filter = "WHERE hub_id = :hub_id" if hub_id is not None else ""
+    params = {'hub_id': hub_id}
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        begin_write(conn) # Hold the write lock so no trigger fires between the check and the rebuild
+        cursor.execute(GRIEVANCE_STATS_COUNT_SQL.format(hub_filter=hub_filter), params)
+        expected = {(r['hub_id'], r['status'], r['category'], r['severity']): r['n'] for r in cursor.fetchall()}
+        cursor.execute(f"SELECT hub_id, status, category, severity, n FROM grievance_stats {hub_filter}", params)
+        actual = {(r['hub_id'], r['status'], r['category'], r['severity']): r['n'] for r in cursor.fetchall()}
+
+        drift = []
+        for key in sorted(set(expected) | set(actual)):
+            if expected.get(key, 0) != actual.get(key, 0):
+                drift_hub_id, status, category, severity = key
+                drift.append({
+                    'hub_id': drift_hub_id, 'status': status, 'category': category, 'severity': severity,
+                    'expected': expected.get(key, 0), 'actual': actual.get(key, 0),
+                })
+
+        if drift and not verify_only:
+            cursor.execute(f"DELETE FROM grievance_stats {hub_filter}", params)
+            cursor.execute(GRIEVANCE_STATS_REBUILD_SQL.format(hub_filter=hub_filter), params)
+        conn.commit()
+    if drift and not verify_only:
+        invalidate_read_cache()
+    return drift
+
+# --- Archiving ---
+ARCHIVE_AFTER_DAYS = int(os.environ.get("LOVE_HUB_ARCHIVE_AFTER_DAYS", "90")) # Resolved notes older than this move to the archive
+ARCHIVE_CHUNK_SIZE = 200 # Rows moved per transaction, so writers only ever wait on one small chunk
+ARCHIVED_STATUS = RESOLVED_STATUS
+
+@traced_db_call
+def archive_resolved_grievances(older_than_days=ARCHIVE_AFTER_DAYS, chunk_size=ARCHIVE_CHUNK_SIZE, hub_id=None):
+    # Moves resolved grievances submitted more than older_than_days ago into grievances_archive,
+    # one short transaction per chunk, for one hub or (hub_id=None) every hub. Returns how many were archived.
+    columns = "id, hub_id, timestamp, title, details, category, severity, status, resolution_notes, submitted_by, target_resolution_date, resolved_at"
+    if hub_id is None:
+        with get_db_connection() as conn:
+            hub_ids = [row['hub_id'] for row in conn.execute("SELECT DISTINCT hub_id FROM grievances")]
+    else:
+        hub_ids = [hub_id]
+    archived = 0
+    for archive_hub_id in hub_ids:
+        while True:
+            with get_db_connection() as conn:
+                begin_write(conn)
+                cursor = conn.cursor()
+                cursor.execute(f"""
+                    SELECT {columns} FROM grievances
+                    WHERE hub_id = ? AND status = ? AND timestamp < datetime('now', ?)
+                    ORDER BY timestamp
+                    LIMIT ?
+                """, (archive_hub_id, ARCHIVED_STATUS, f"-{int(older_than_days)} days", chunk_size))
+                chunk = [tuple(row) for row in cursor.fetchall()]
+                if chunk:
+                    # Delete before inserting: both tables feed the same search index under the same
+                    # rowid, so the index entry has to be dropped before it's added back
+                    cursor.executemany("DELETE FROM grievances WHERE id = ?", [(row[0],) for row in chunk])
+                    cursor.executemany(f"INSERT INTO grievances_archive ({columns}) VALUES ({', '.join('?' * len(chunk[0]))})", chunk)
+                conn.commit()
+            archived += len(chunk)
+            if len(chunk) < chunk_size:
+                break
+    if archived:
+        invalidate_read_cache()
+    return archived
+
+@traced_db_call
+def reclaim_free_pages(max_pages=None):
+    # Hands pages freed by archiving/deleting back to the filesystem, max_pages at a time (all if None).
+    # Only works with auto_vacuum=INCREMENTAL; a database created before that was set is left alone
+    # until enable_incremental_vacuum() has run. Returns {'freed_pages': int, 'incremental': bool}.
+    with get_db_connection() as conn:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2: # 2 = INCREMENTAL
+            return {'freed_pages': 0, 'incremental': False}
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        # executescript steps the pragma to completion; execute() stops after one step, i.e. one page
+        conn.executescript(f"PRAGMA incremental_vacuum({int(max_pages) if max_pages is not None else 0});")
+        freed_pages = free_pages - conn.execute("PRAGMA freelist_count").fetchone()[0]
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall() # The file only shrinks once the WAL is checkpointed
+    return {'freed_pages': freed_pages, 'incremental': True}
+
+def enable_incremental_vacuum(db_name=None):
+    # One-time switch to auto_vacuum=INCREMENTAL for a database created before it was set. Takes a
+    # full VACUUM, which rewrites the whole file and holds the write lock throughout, so it's run by
+    # hand (python database.py enable-incremental-vacuum), never from the app.
+    # Returns False if the database was already incremental.
+    conn = sqlite3.connect(db_name or DB_NAME, timeout=MIGRATION_LOCK_TIMEOUT_S)
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return False
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM") # Rewrites the file, which also frees every free page
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+        return True
+    finally:
+        conn.close()
+
+# --- Helper Functions ---
+@traced_db_call
+def add_grievance(title, details, category, severity, target_date, hub_id=DEFAULT_HUB_ID):
+    execute_write("""
+        INSERT INTO grievances (title, details, category, severity, target_resolution_date, status, hub_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (title, details, category, severity, target_date, '💖 Open', hub_id))
+
+IST_TIMEZONE = 'Asia/Kolkata'
+IST_OFFSET = datetime.timedelta(hours=5, minutes=30)
+
+GRIEVANCE_COLUMNS = ['id', 'timestamp', 'title', 'details', 'category', 'severity', 'status', 'resolution_notes', 'target_resolution_date']
+
+@traced_db_call
+def get_grievances_df(hub_id=DEFAULT_HUB_ID):
+    # Every grievance in the hub as a compact, typed DataFrame (newest first). Rows are fetched in storage
+    # order and turned into columns in one go, then all timestamps are converted to IST in a single
+    # vectorized step: 'submitted_at' is tz-aware, and status/category/severity are Categoricals.
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = None # Plain tuples: we only need them long enough to transpose into columns
+        cursor.execute(f"SELECT {', '.join(GRIEVANCE_COLUMNS)} FROM grievances WHERE hub_id = ?", (hub_id,))
+        columns = list(zip(*cursor.fetchall())) or [()] * len(GRIEVANCE_COLUMNS)
+    data = {name: np.asarray(values, dtype=object) for name, values in zip(GRIEVANCE_COLUMNS, columns)}
+
+    # SQLite's CURRENT_TIMESTAMP is a UTC string like 'YYYY-MM-DD HH:MM:SS'
+    submitted_at = pd.to_datetime(data['timestamp'], format='%Y-%m-%d %H:%M:%S', utc=True)
+    ids = data['id'].astype('int64')
+    # Newest first, ties broken by id. Sorting here is far cheaper than making SQLite walk the
+    # timestamp index row by row.
+    order = np.lexsort((ids, submitted_at.asi8))[::-1]
+
+    return pd.DataFrame({
+        'id': ids[order],
+        'submitted_at': submitted_at.tz_convert(IST_TIMEZONE)[order],
+        'title': pd.array(data['title'][order], dtype='string[pyarrow]'),
+        'details': pd.array(data['details'][order], dtype='string[pyarrow]'),
+        # A handful of distinct values repeated on every row
+        'category': pd.Categorical(data['category'][order]),
+        'severity': pd.Categorical(data['severity'][order]),
+        'status': pd.Categorical(data['status'][order]),
+        'resolution_notes': pd.array(data['resolution_notes'][order], dtype='string[pyarrow]'),
+        'target_resolution_date': pd.array(data['target_resolution_date'][order], dtype='string[pyarrow]'),
+    })
+
+@traced_db_call
+def get_all_grievances(hub_id=DEFAULT_HUB_ID):
+    # Every grievance in the hub as plain dicts (newest first), with the same keys the per-row loader
+    # used to produce. Going through get_grievances_df() and back to dicts costs more than building
+    # them straight from the rows. The IST display time is a fixed offset, as in IST_DAY_SQL.
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        cursor.execute(f"SELECT {', '.join(GRIEVANCE_COLUMNS)} FROM grievances WHERE hub_id = ? ORDER BY timestamp DESC, id DESC", (hub_id,))
+        rows = cursor.fetchall()
+    keys = GRIEVANCE_COLUMNS + ['submitted_on']
+    from_utc = datetime.datetime.fromisoformat
+    return [
+        dict(zip(keys, (*row, (from_utc(row[1]) + IST_OFFSET).strftime('%Y-%m-%d %I:%M %p IST')))) # e.g., 2025-05-20 01:50 PM IST
+        for row in rows
+    ]
+
+def process_grievance_row(row_raw):
+    ist_timezone = pytz.timezone('Asia/Kolkata')
+    utc_timezone = pytz.utc
+
+    row = dict(row_raw) # Convert sqlite3.Row to dict for easier manipulation
+    
+    # Convert timestamp from UTC to IST
+    utc_dt_str = row['timestamp'] # This is a string like 'YYYY-MM-DD HH:MM:SS'
+    
+    # Parse the string to a naive datetime object
+    naive_dt = datetime.datetime.strptime(utc_dt_str, '%Y-%m-%d %H:%M:%S')
+    
+    # Localize the naive datetime object to UTC
+    utc_dt = utc_timezone.localize(naive_dt)
+    
+    # Convert to IST
+    ist_dt = utc_dt.astimezone(ist_timezone)
+    
+    # Format for display
+    row['submitted_on'] = ist_dt.strftime('%Y-%m-%d %I:%M %p IST') # e.g., 2025-05-20 01:50 PM IST
+    
+    # Keep the original UTC 'timestamp' string too: the ledger uses (timestamp, id) as its page cursor
+    return row
+
+@traced_db_call
+@cached_read
+def get_grievances_page(page_size, cursor=None, hub_id=DEFAULT_HUB_ID):
+    # Keyset pagination over one hub, walking the (hub_id, timestamp, id) index: 'cursor' is the
+    # (timestamp, id) of the last row on the previous page.
+    # Returns (rows, next_cursor); next_cursor is None when there's nothing more to load.
+    with get_db_connection() as conn:
+        db_cursor = conn.cursor()
+        columns = "id, timestamp, title, details, category, severity, status, resolution_notes, target_resolution_date"
+        if cursor is None:
+            db_cursor.execute(f"""
+                SELECT {columns} FROM grievances
+                WHERE hub_id = ?
+                ORDER BY timestamp DESC, id DESC
+                LIMIT ?
+            """, (hub_id, page_size + 1))
+        else:
+            db_cursor.execute(f"""
+                SELECT {columns} FROM grievances
+                WHERE hub_id = ? AND (timestamp, id) < (?, ?)
+                ORDER BY timestamp DESC, id DESC
+                LIMIT ?
+            """, (hub_id, cursor[0], cursor[1], page_size + 1))
+        grievances_raw = db_cursor.fetchall()
+
+    # We asked for one extra row just to know whether another page exists
+    has_more = len(grievances_raw) > page_size
+    rows = [process_grievance_row(row_raw) for row_raw in grievances_raw[:page_size]]
+    next_cursor = (rows[-1]['timestamp'], rows[-1]['id']) if has_more else None
+    return rows, next_cursor
+
+
+def fts_match_expression(query):
+    # Turns free text from the search box into a safe FTS5 query: every word must appear,
+    # as a prefix, so "date nig" finds "Date Night Ideas". Returns None if there's nothing to search for.
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+@traced_db_call
+@cached_read
+def search_grievances(query, page_size, page=0, hub_id=DEFAULT_HUB_ID):
+    # Full-text search over the hub's title, details and resolution notes, best BM25 match first
+    # (title hits weigh the most). Archived grievances are searched too, flagged with 'archived'.
+    # The index is shared by every hub, so matches are narrowed to the hub as they're joined.
+    # Returns (rows, next_page); next_page is None on the last page.
+    match_expression = fts_match_expression(query)
+    if match_expression is None:
+        return [], None
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        # Matches are joined to each table separately: joining the grievances_all view would
+        # materialize both tables before the first lookup
+        columns = "id, timestamp, title, details, category, severity, status, resolution_notes, target_resolution_date"
+        cursor.execute(f"""
+            WITH matches AS (
+                SELECT rowid, bm25(grievances_fts, 5.0, 1.0, 2.0) AS rank
+                FROM grievances_fts
+                WHERE grievances_fts MATCH ?
+            )
+            SELECT {columns}, 0 AS archived, rank FROM matches JOIN grievances ON id = matches.rowid AND hub_id = ?
+            UNION ALL
+            SELECT {columns}, 1 AS archived, rank FROM matches JOIN grievances_archive ON id = matches.rowid AND hub_id = ?
+            ORDER BY rank, id DESC
+            LIMIT ? OFFSET ?
+        """, (match_expression, hub_id, hub_id, page_size + 1, page * page_size))
+        grievances_raw = cursor.fetchall()
+
+    # One extra row tells us whether there's another page
+    has_more = len(grievances_raw) > page_size
+    rows = [process_grievance_row(row_raw) for row_raw in grievances_raw[:page_size]]
+    return rows, (page + 1 if has_more else None)
+
+@traced_db_call
+@cached_read
+def get_grievance_stats(hub_id=DEFAULT_HUB_ID):
+    # The hub's status and category counts, read from the trigger-maintained grievance_stats rollup,
+    # which holds at most one row per hub/status/category/severity combination.
+    # Returns {'total': int, 'status_counts': {status: n}, 'category_counts': {category: n}}
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT status, category, n FROM grievance_stats WHERE hub_id = ?", (hub_id,))
+        stats_raw = cursor.fetchall()
+
+    stats = {'total': 0, 'status_counts': {}, 'category_counts': {}}
+    for row in stats_raw:
+        stats['total'] += row['n']
+        if row['status'] != '': # '' stands in for a NULL status/category
+            stats['status_counts'][row['status']] = stats['status_counts'].get(row['status'], 0) + row['n']
+        if row['category'] != '':
+            stats['category_counts'][row['category']] = stats['category_counts'].get(row['category'], 0) + row['n']
+    return stats
+
+DUE_SOON_DAYS = 7 # "Due this week": today and the six days after it
+UNRESOLVED_STATUSES = [status for status in STATUS_OPTIONS if status != RESOLVED_STATUS]
+
+def today_ist():
+    # Due dates are calendar days, so "today" is the day it is where the notes are read
+    return datetime.datetime.now(pytz.timezone(IST_TIMEZONE)).date()
+
+@traced_db_call
+@cached_read
+def get_due_counts(today, hub_id=DEFAULT_HUB_ID):
+    # How many unresolved notes in the hub are overdue (target date before today) and due soon
+    # (within DUE_SOON_DAYS), per status. Each count is a range of the (hub_id, status,
+    # target_resolution_date) index, counted without reading a single row; resolved notes are never touched.
+    # Returns {'overdue': int, 'due_soon': int, 'by_status': {status: (overdue, due_soon)}}
+    due_soon_end = today + datetime.timedelta(days=DUE_SOON_DAYS)
+    counts_raw = []
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        for status in UNRESOLVED_STATUSES:
+            cursor.execute("""
+                SELECT
+                    (SELECT COUNT(*) FROM grievances
+                     WHERE hub_id = :hub_id AND status = :status AND target_resolution_date < :today) AS overdue,
+                    (SELECT COUNT(*) FROM grievances
+                     WHERE hub_id = :hub_id AND status = :status AND target_resolution_date >= :today AND target_resolution_date < :due_soon_end) AS due_soon
+            """, {'hub_id': hub_id, 'status': status, 'today': today.isoformat(), 'due_soon_end': due_soon_end.isoformat()})
+            overdue, due_soon = cursor.fetchone()
+            if overdue or due_soon:
+                counts_raw.append((status, overdue, due_soon))
+
+    counts = {'overdue': 0, 'due_soon': 0, 'by_status': {}}
+    for status, overdue, due_soon in counts_raw:
+        counts['overdue'] += overdue
+        counts['due_soon'] += due_soon
+        counts['by_status'][status] = (overdue, due_soon)
+    return counts
+
+@traced_db_call
+@cached_read
+def get_due_grievances(due, today, limit, hub_id=DEFAULT_HUB_ID):
+    # The hub's unresolved notes that are 'overdue' or 'due_soon', soonest target date first,
+    # read in order off the partial index of unresolved notes. Returns (rows, has_more).
+    due_soon_end = today + datetime.timedelta(days=DUE_SOON_DAYS)
+    if due == "overdue":
+        date_range = ("target_resolution_date < ?", (today.isoformat(),))
+    elif due == "due_soon":
+        date_range = ("target_resolution_date >= ? AND target_resolution_date < ?", (today.isoformat(), due_soon_end.isoformat()))
+    else:
+        raise ValueError(f"Unknown due filter: {due!r}")
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        columns = "id, timestamp, title, details, category, severity, status, resolution_notes, target_resolution_date"
+        cursor.execute(f"""
+            SELECT {columns} FROM grievances
+            WHERE hub_id = ? AND {UNRESOLVED_STATUS_CONDITION} AND {date_range[0]}
+            ORDER BY target_resolution_date, id
+            LIMIT ?
+        """, (hub_id, *date_range[1], limit + 1))
+        grievances_raw = cursor.fetchall()
+
+    # One extra row tells us whether there's more
+    return [process_grievance_row(row_raw) for row_raw in grievances_raw[:limit]], len(grievances_raw) > limit
+
+@traced_db_call
+@cached_read
+def get_daily_trends(hub_id=DEFAULT_HUB_ID):
+    # Notes opened and resolved per IST day in the hub, oldest day first, straight from the
+    # grievance_daily rollup: one row per day that saw any activity.
+    # Returns [(day 'YYYY-MM-DD', opened, resolved)]
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        cursor.execute("SELECT day, opened, resolved FROM grievance_daily WHERE hub_id = ? ORDER BY day", (hub_id,))
+        return cursor.fetchall()
+
+def _bucket_median_hours(bucket_counts):
+    # Median of a resolution-time histogram {bucket: n}: finds the bucket holding the middle note
+    # and interpolates geometrically between its bounds (linearly in bucket 0, which starts at zero)
+    total = sum(bucket_counts.values())
+    middle = total / 2
+    seen = 0
+    for bucket in sorted(bucket_counts):
+        n = bucket_counts[bucket]
+        if seen + n >= middle:
+            if bucket >= len(RESOLUTION_BUCKET_HOURS): # Open-ended: all we know is it's past the last bound
+                return RESOLUTION_BUCKET_HOURS[-1]
+            upper = RESOLUTION_BUCKET_HOURS[bucket]
+            fraction = (middle - seen) / n
+            if bucket == 0:
+                return upper * fraction
+            lower = RESOLUTION_BUCKET_HOURS[bucket - 1]
+            return lower * (upper / lower) ** fraction
+        seen += n
+    return None
+
+@traced_db_call
+@cached_read
+def get_resolution_times(hub_id=DEFAULT_HUB_ID):
+    # Median time-to-resolution per category in the hub, read from the grievance_resolution_times
+    # buckets: at most a few dozen rows per category. Only notes with a recorded resolved_at count.
+    # Returns {category: {'resolved': n, 'median_hours': float}}
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT category, bucket, n FROM grievance_resolution_times WHERE hub_id = ?", (hub_id,))
+        buckets_raw = cursor.fetchall()
+
+    buckets_by_category = {}
+    for row in buckets_raw:
+        buckets_by_category.setdefault(row['category'], {})[row['bucket']] = row['n']
+    return {
+        category: {'resolved': sum(bucket_counts.values()), 'median_hours': _bucket_median_hours(bucket_counts)}
+        for category, bucket_counts in buckets_by_category.items()
+        if category != '' # '' stands in for a NULL category
+    }
+
+CHANGE_FEED_MAX = 500 # More changes than this at once and a session simply reloads
+
+@traced_db_call
+def get_latest_change_id():
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT IFNULL(MAX(change_id), 0) FROM grievance_changes")
+        return cursor.fetchone()[0]
+
+@traced_db_call
+def get_grievance_changes(since_change_id, limit=CHANGE_FEED_MAX, hub_id=DEFAULT_HUB_ID):
+    # What changed in the hub after since_change_id, for patching a view in place.
+    # Returns (latest_change_id, rows_by_id, complete): rows_by_id maps each changed grievance's id
+    # to its current row, or None if it's been deleted. complete is False when the log no longer
+    # reaches back that far, or there are more than `limit` changes - reload instead of patching.
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT MIN(change_id), MAX(change_id) FROM grievance_changes")
+        oldest_change_id, newest_change_id = cursor.fetchone()
+        if newest_change_id is None or newest_change_id == since_change_id:
+            return since_change_id, {}, True
+        if newest_change_id < since_change_id: # The log went backwards (e.g. a restored backup)
+            return since_change_id, {}, False
+        if oldest_change_id > since_change_id + 1: # Pruned past where we left off
+            return newest_change_id, {}, False
+        # Other hubs' changes are skipped over, but still move this session's watermark along
+        cursor.execute("""
+            SELECT change_id, grievance_id FROM grievance_changes
+            WHERE change_id > ? AND change_id <= ? AND hub_id = ?
+            ORDER BY change_id
+            LIMIT ?
+        """, (since_change_id, newest_change_id, hub_id, limit + 1))
+        changes = cursor.fetchall()
+        if len(changes) > limit:
+            return newest_change_id, {}, False
+        if not changes:
+            return newest_change_id, {}, True
+
+        changed_ids = list({change['grievance_id'] for change in changes})
+        placeholders = ", ".join("?" * len(changed_ids))
+        cursor.execute(f"""
+            SELECT id, timestamp, title, details, category, severity, status, resolution_notes, target_resolution_date
+            FROM grievances WHERE id IN ({placeholders}) AND hub_id = ?
+        """, changed_ids + [hub_id])
+        current_rows = {row['id']: process_grievance_row(row) for row in cursor.fetchall()}
+    return newest_change_id, {grievance_id: current_rows.get(grievance_id) for grievance_id in changed_ids}, True
+
+# resolved_at for an UPDATE setting status to the bound value: stamped when a note becomes resolved,
+# kept while it stays resolved, cleared if it's reopened
+RESOLVED_AT_SQL = f"CASE WHEN ? != '{RESOLVED_STATUS}' THEN NULL WHEN status = '{RESOLVED_STATUS}' THEN resolved_at ELSE CURRENT_TIMESTAMP END"
+
+@traced_db_call
+def update_grievance_status(grievance_id, new_status, resolution_notes="", hub_id=DEFAULT_HUB_ID):
+    # Writes are scoped by hub as well as id, so no hub can touch another's notes
+    execute_write(f"""
+        UPDATE grievances
+        SET resolved_at = {RESOLVED_AT_SQL}, status = ?, resolution_notes = ?
+        WHERE id = ? AND hub_id = ?
+    """, (new_status, new_status, resolution_notes, grievance_id, hub_id))
+
+@traced_db_call
+def bulk_update_grievance_status(grievance_ids, new_status, resolution_notes=None, hub_id=DEFAULT_HUB_ID):
+    # Sets the status of every listed grievance in one transaction. resolution_notes=None keeps
+    # each note's existing resolution notes. Returns how many grievances were updated.
+    with get_db_connection() as conn:
+        begin_write(conn)
+        cursor = conn.cursor()
+        cursor.executemany(f"""
+            UPDATE grievances
+            SET resolved_at = {RESOLVED_AT_SQL}, status = ?, resolution_notes = COALESCE(?, resolution_notes)
+            WHERE id = ? AND hub_id = ?
+        """, [(new_status, new_status, resolution_notes, grievance_id, hub_id) for grievance_id in grievance_ids])
+        updated = cursor.rowcount
+        conn.commit()
+    invalidate_read_cache()
+    return updated
+
+@traced_db_call
+def update_grievances(edits, hub_id=DEFAULT_HUB_ID):
+    # Writes a batch of per-note edits - dicts with 'id', 'status' and 'resolution_notes' - in one
+    # transaction. Returns how many grievances were updated.
+    if not edits:
+        return 0
+    with get_db_connection() as conn:
+        begin_write(conn)
+        cursor = conn.cursor()
+        cursor.executemany(f"""
+            UPDATE grievances
+            SET resolved_at = {RESOLVED_AT_SQL}, status = ?, resolution_notes = ?
+            WHERE id = ? AND hub_id = ?
+        """, [(edit['status'], edit['status'], edit['resolution_notes'], edit['id'], hub_id) for edit in edits])
+        updated = cursor.rowcount
+        conn.commit()
+    invalidate_read_cache()
+    return updated
+
+@traced_db_call
+def delete_grievance(grievance_id, hub_id=DEFAULT_HUB_ID):
+    execute_write("DELETE FROM grievances WHERE id = ? AND hub_id = ?", (grievance_id, hub_id))
+
+@traced_db_call
+def bulk_delete_grievances(grievance_ids, hub_id=DEFAULT_HUB_ID):
+    # Deletes every listed grievance in one transaction. Returns how many were deleted.
+    with get_db_connection() as conn:
+        begin_write(conn)
+        cursor = conn.cursor()
+        cursor.executemany("DELETE FROM grievances WHERE id = ? AND hub_id = ?", [(grievance_id, hub_id) for grievance_id in grievance_ids])
+        deleted = cursor.rowcount
+        conn.commit()
+    invalidate_read_cache()
+    return deleted
+
+
+def main():
+    global DB_NAME
+    parser = argparse.ArgumentParser(description="One-off Love Hub database maintenance.")
+    parser.add_argument("--db", default=None, help=f"Database file (default: {DB_NAME})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("enable-incremental-vacuum", help="Rewrite the file once so archived space can be handed back (blocks writes while it runs)")
+    commands.add_parser("reclaim", help="Hand pages freed by archiving back to the filesystem")
+    stats = commands.add_parser("rebuild-stats", help="Recount the stats rollup and fix any drift")
+    stats.add_argument("--hub", default=None, help="Only this hub (default: every hub)")
+    stats.add_argument("--verify", action="store_true", help="Only report drift, don't fix it")
+    args = parser.parse_args()
+
+    if args.db:
+        DB_NAME = args.db # The helpers below go through the shared pool, which opens DB_NAME
+    if args.command == "enable-incremental-vacuum":
+        started = time.perf_counter()
+        if enable_incremental_vacuum(args.db):
+            print(f"Switched to incremental vacuum in {time.perf_counter() - started:.2f}s")
+        else:
+            print("Already using incremental vacuum")
+    elif args.command == "reclaim":
+        reclaimed = reclaim_free_pages()
+        if reclaimed['incremental']:
+            print(f"Freed {reclaimed['freed_pages']:,} pages")
+        else:
+            print("Not using incremental vacuum yet; run enable-incremental-vacuum first")
+    elif args.command == "rebuild-stats":
+        ensure_schema()
+        drift = rebuild_grievance_stats(verify_only=args.verify, hub_id=normalize_hub_id(args.hub) if args.hub else None)
+        for row in drift:
+            print(f"  {row['hub_id']} / {row['status']} / {row['category']} / {row['severity']}: expected {row['expected']}, found {row['actual']}")
+        print(f"{len(drift)} drifted count(s)" + (" fixed" if drift and not args.verify else ""))
+
+
+if __name__ == "__main__":
+    main()
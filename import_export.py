@@ -0,0 +1,379 @@
+import io
+import os
+import re
+import csv
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import datetime
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from database import (
+    DB_NAME,
+    BUSY_TIMEOUT_MS,
+    DEFAULT_HUB_ID,
+    normalize_hub_id,
+    CATEGORY_OPTIONS,
+    SEVERITY_OPTIONS,
+    STATUS_OPTIONS,
+    RESOLVED_STATUS,
+    GRIEVANCE_DAILY_COUNT_SQL,
+    GRIEVANCE_RESOLUTION_COUNT_SQL,
+    run_migrations,
+    invalidate_read_cache,
+)
+
+# --- Import / Export ---
+# Headless bulk data in and out of the grievances table, as CSV, JSONL or Parquet.
+#
+#   python import_export.py export grievances.parquet
+#   python import_export.py import old_hub.csv
+#
+# Exports stream EXPORT_CHUNK_ROWS rows at a time, so memory stays flat however big the table is.
+# They cover archived notes too, after the hot ones, flagged archived=1. An import puts every note
+# back in the hot table; the next archive run moves the long-resolved ones out again.
+# Imports validate every row against the app's option lists and insert them in chunks, one
+# transaction each. Inside each transaction the per-row triggers on grievances are set aside and their
+# work (stats and trend rollups, search index, change feed) is done once for the whole chunk, set-wise; other
+# connections never see the table without its triggers, since it all commits or rolls back together.
+# Each transaction holds SQLite's write lock, so the app can't save anything while a chunk goes in:
+# chunks are sized to take about IMPORT_TRANSACTION_S, well inside the app's busy timeout, with a
+# pause between them for waiting writes. Expect app writes to stall for a second or so during an import.
+FORMATS = ("csv", "jsonl", "parquet")
+EXPORT_COLUMNS = ['id', 'hub_id', 'timestamp', 'title', 'details', 'category', 'severity', 'status', 'resolution_notes', 'submitted_by', 'target_resolution_date', 'resolved_at', 'archived']
+IMPORT_COLUMNS = ['hub_id', 'timestamp', 'title', 'details', 'category', 'severity', 'status', 'resolution_notes', 'submitted_by', 'target_resolution_date', 'resolved_at']
+EXPORT_CHUNK_ROWS = 10_000
+IMPORT_CHUNK_ROWS = 50_000 # Upper bound; the actual chunk size follows IMPORT_TRANSACTION_S
+IMPORT_FIRST_CHUNK_ROWS = 2_000 # Small enough to stay under the time budget on a slow disk
+IMPORT_TRANSACTION_S = 1.0 # Target write-lock hold per chunk, vs. BUSY_TIMEOUT_MS for the app's writes
+IMPORT_PAUSE_S = 0.1 # Between chunks, longer than SQLite's longest busy-handler sleep (100 ms)
+IMPORT_CACHE_KIB = 131_072 # A big page cache keeps the indexes being extended in memory
+MAX_REPORTED_ERRORS = 20
+# Every trigger bulk_insert_rows redoes by hand; a trigger on grievances outside this set would
+# silently lose its effect for bulk-imported rows, so the import refuses to run instead
+BULK_INSERT_TRIGGERS = frozenset(
+    f"trg_{prefix}_{event}"
+    for prefix in ("grievance_stats", "grievance_trends", "grievances_fts", "grievance_changes")
+    for event in ("insert", "update", "delete")
+)
+
+PARQUET_SCHEMA = pa.schema([('id', pa.int64())] + [(column, pa.string()) for column in EXPORT_COLUMNS[1:-1]] + [('archived', pa.int64())])
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    fmt = {"csv": "csv", "jsonl": "jsonl", "ndjson": "jsonl", "parquet": "parquet", "pq": "parquet"}.get(extension)
+    if fmt is None:
+        raise ValueError(f"Can't tell the format of {path}; pass --format ({', '.join(FORMATS)})")
+    return fmt
+
+def _connect(db_name, cache_kib=None):
+    conn = sqlite3.connect(db_name or DB_NAME, timeout=BUSY_TIMEOUT_MS / 1000)
+    conn.execute("PRAGMA journal_mode=WAL")
+    if cache_kib:
+        conn.execute(f"PRAGMA cache_size=-{int(cache_kib)}")
+    return conn
+
+# --- Export ---
+def _export_chunks(conn, chunk_rows, hub_id):
+    # Hot notes first, then the archive, each in id order: two plain index walks, no sort of the whole lot
+    columns = ', '.join(EXPORT_COLUMNS[:-1])
+    for table, archived in (("grievances", 0), ("grievances_archive", 1)):
+        if hub_id is None:
+            cursor = conn.execute(f"SELECT {columns}, {archived} AS archived FROM {table} ORDER BY id")
+        else:
+            cursor = conn.execute(f"SELECT {columns}, {archived} AS archived FROM {table} WHERE hub_id = ? ORDER BY id", (hub_id,))
+        while True:
+            chunk = cursor.fetchmany(chunk_rows)
+            if not chunk:
+                break
+            yield chunk
+
+def export_grievances(out, fmt, db_name=None, chunk_rows=EXPORT_CHUNK_ROWS, hub_id=None):
+    # Writes every grievance in the hub (every hub if None), archived ones included, to `out`, a path
+    # or a binary file object. Returns how many were written.
+    conn = _connect(db_name)
+    close_out = isinstance(out, str)
+    if close_out:
+        out = open(out, "wb")
+    written = 0
+    try:
+        if fmt == "parquet":
+            with pq.ParquetWriter(out, PARQUET_SCHEMA, compression="zstd") as writer:
+                for chunk in _export_chunks(conn, chunk_rows, hub_id):
+                    columns = list(zip(*chunk))
+                    writer.write_table(pa.table(
+                        [pa.array(values, type=field.type) for values, field in zip(columns, PARQUET_SCHEMA)],
+                        schema=PARQUET_SCHEMA
+                    )) # One row group per chunk
+                    written += len(chunk)
+        else:
+            text = io.TextIOWrapper(out, encoding="utf-8", newline="", write_through=True)
+            try:
+                if fmt == "csv":
+                    writer = csv.writer(text)
+                    writer.writerow(EXPORT_COLUMNS)
+                    for chunk in _export_chunks(conn, chunk_rows, hub_id):
+                        writer.writerows(chunk)
+                        written += len(chunk)
+                else:
+                    for chunk in _export_chunks(conn, chunk_rows, hub_id):
+                        text.write("".join(json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False) + "\n" for row in chunk))
+                        written += len(chunk)
+            finally:
+                text.detach() # Leave `out` open for its owner
+    finally:
+        conn.close()
+        if close_out:
+            out.close()
+    return written
+
+def export_grievances_bytes(fmt, db_name=None, hub_id=None):
+    # The whole export in memory, for handing to a download button
+    buffer = io.BytesIO()
+    export_grievances(buffer, fmt, db_name, hub_id=hub_id)
+    return buffer.getvalue()
+
+# --- Import ---
+def _read_records(source, fmt, chunk_rows):
+    # Yields (line_number, record dict) from a path, in file order
+    if fmt == "csv":
+        with open(source, newline="", encoding="utf-8-sig") as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            for line_number, values in enumerate(reader, start=2): # Line 1 is the header
+                yield line_number, dict(zip(header, values))
+    elif fmt == "jsonl":
+        with open(source, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                if line.strip():
+                    try:
+                        yield line_number, json.loads(line)
+                    except json.JSONDecodeError as e:
+                        yield line_number, e
+    else:
+        line_number = 0
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_rows):
+            for record in batch.to_pylist():
+                line_number += 1
+                yield line_number, record
+
+CATEGORY_SET = frozenset(CATEGORY_OPTIONS)
+SEVERITY_SET = frozenset(SEVERITY_OPTIONS)
+STATUS_SET = frozenset(STATUS_OPTIONS)
+CANONICAL_TIMESTAMP = re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}")
+
+def _clean(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+def _parse_timestamp(value):
+    # Stored like SQLite's CURRENT_TIMESTAMP: 'YYYY-MM-DD HH:MM:SS' in UTC
+    if isinstance(value, datetime.datetime):
+        parsed = value
+    else:
+        parsed = datetime.datetime.fromisoformat(value)
+    if isinstance(value, str) and CANONICAL_TIMESTAMP.fullmatch(value):
+        return value # Already in the stored format (e.g. our own exports); fromisoformat() has vetted it
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return parsed.strftime('%Y-%m-%d %H:%M:%S')
+
+def validate_grievance_record(record, now, hub_id=DEFAULT_HUB_ID):
+    # Turns an imported record into an insertable row tuple (IMPORT_COLUMNS order); records without
+    # a hub_id of their own go to `hub_id`. Raises ValueError with a readable reason when the record
+    # doesn't fit the app.
+    if isinstance(record, Exception):
+        raise ValueError(f"not valid JSON ({record})")
+    if not isinstance(record, dict): # Valid JSON, but e.g. a list or a bare string
+        raise ValueError("not a JSON object")
+    record_hub_id = _clean(record.get('hub_id'))
+    if record_hub_id is not None:
+        hub_id = normalize_hub_id(record_hub_id)
+    title = _clean(record.get('title'))
+    if title is None:
+        raise ValueError("title is missing")
+    category = _clean(record.get('category'))
+    if category not in CATEGORY_SET:
+        raise ValueError(f"unknown category {category!r}")
+    severity = _clean(record.get('severity'))
+    if severity not in SEVERITY_SET:
+        raise ValueError(f"unknown severity {severity!r}")
+    status = _clean(record.get('status')) or STATUS_OPTIONS[0]
+    if status not in STATUS_SET:
+        raise ValueError(f"unknown status {status!r}")
+    raw_timestamp = record.get('timestamp')
+    raw_target_date = record.get('target_resolution_date')
+    try:
+        timestamp = _parse_timestamp(raw_timestamp if isinstance(raw_timestamp, datetime.datetime) else _clean(raw_timestamp)) if raw_timestamp not in (None, "") else now
+    except ValueError:
+        raise ValueError(f"bad timestamp {raw_timestamp!r}")
+    try:
+        if isinstance(raw_target_date, datetime.date):
+            target_date = raw_target_date.isoformat()[:10]
+        else:
+            target_date = _clean(raw_target_date)
+            target_date = datetime.date.fromisoformat(target_date[:10]).isoformat() if target_date else None
+    except ValueError:
+        raise ValueError(f"bad target_resolution_date {raw_target_date!r}")
+    # Only resolved notes have a resolution time; a resolved note without one just isn't timed
+    raw_resolved_at = record.get('resolved_at')
+    resolved_at = None
+    if status == RESOLVED_STATUS and raw_resolved_at not in (None, ""):
+        try:
+            resolved_at = _parse_timestamp(raw_resolved_at if isinstance(raw_resolved_at, datetime.datetime) else _clean(raw_resolved_at))
+        except ValueError:
+            raise ValueError(f"bad resolved_at {raw_resolved_at!r}")
+    return (
+        hub_id, timestamp, title, _clean(record.get('details')), category, severity, status,
+        _clean(record.get('resolution_notes')), _clean(record.get('submitted_by')) or 'My Love ❤️', target_date, resolved_at,
+    )
+
+def bulk_insert_rows(conn, rows, columns=IMPORT_COLUMNS):
+    # Inserts row tuples (in `columns` order) as new grievances in one transaction: the rows go in
+    # with the grievances triggers set aside, then the triggers' work is redone set-wise for exactly
+    # the new ids, and the triggers are put back as they were. Returns how many rows were inserted.
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        triggers = cursor.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'grievances'").fetchall()
+        found = {name for name, _sql in triggers}
+        if found != BULK_INSERT_TRIGGERS:
+            raise RuntimeError(
+                "bulk insert doesn't know how to redo the grievances triggers: "
+                f"unexpected {sorted(found - BULK_INSERT_TRIGGERS)}, missing {sorted(BULK_INSERT_TRIGGERS - found)}"
+            )
+        for name, _sql in triggers:
+            cursor.execute(f'DROP TRIGGER "{name}"')
+        # AUTOINCREMENT ids only grow, so everything from here on is this chunk's
+        first_id = cursor.execute("SELECT IFNULL(MAX(seq), 0) + 1 FROM sqlite_sequence WHERE name = 'grievances'").fetchone()[0]
+        cursor.executemany(f"""
+            INSERT INTO grievances ({', '.join(columns)})
+            VALUES ({', '.join('?' * len(columns))})
+        """, rows)
+        cursor.execute("""
+            INSERT INTO grievance_stats (hub_id, status, category, severity, n)
+            SELECT hub_id, IFNULL(status, ''), IFNULL(category, ''), IFNULL(severity, ''), COUNT(*)
+            FROM grievances WHERE id >= ?
+            GROUP BY 1, 2, 3, 4
+            ON CONFLICT (hub_id, status, category, severity) DO UPDATE SET n = n + excluded.n
+        """, (first_id,))
+        new_rows = "(SELECT * FROM grievances WHERE id >= :first_id)"
+        cursor.execute(f"""
+            INSERT INTO grievance_daily (hub_id, day, opened, resolved)
+            {GRIEVANCE_DAILY_COUNT_SQL.format(source=new_rows)}
+            ON CONFLICT (hub_id, day) DO UPDATE SET opened = opened + excluded.opened, resolved = resolved + excluded.resolved
+        """, {'first_id': first_id})
+        cursor.execute(f"""
+            INSERT INTO grievance_resolution_times (hub_id, category, bucket, n)
+            {GRIEVANCE_RESOLUTION_COUNT_SQL.format(source=new_rows)}
+            ON CONFLICT (hub_id, category, bucket) DO UPDATE SET n = n + excluded.n
+        """, {'first_id': first_id})
+        cursor.execute("""
+            INSERT INTO grievances_fts (rowid, title, details, resolution_notes)
+            SELECT id, title, details, resolution_notes FROM grievances WHERE id >= ?
+        """, (first_id,))
+        cursor.execute("""
+            INSERT INTO grievance_changes (grievance_id, operation, hub_id)
+            SELECT id, 'insert', hub_id FROM grievances WHERE id >= ?
+        """, (first_id,))
+        for _name, sql in triggers:
+            cursor.execute(sql)
+        conn.commit()
+    except BaseException:
+        conn.rollback() # Takes the dropped triggers back with it
+        raise
+    return len(rows)
+
+def _next_chunk_size(rows, seconds, max_rows):
+    # Scales the last chunk toward IMPORT_TRANSACTION_S, growing it at most 2x at a time
+    fitted = int(rows * IMPORT_TRANSACTION_S / max(seconds, 0.001))
+    return min(max_rows, max(100, min(fitted, rows * 2)))
+
+def import_grievances(source, fmt, db_name=None, chunk_rows=IMPORT_CHUNK_ROWS, strict=False, hub_id=DEFAULT_HUB_ID):
+    # Bulk-inserts the records in `source` (a path) as new grievances; ids are always assigned fresh,
+    # and records without a hub_id column value go into `hub_id`.
+    # Invalid records are skipped and reported, or abort the import when strict (nothing from a
+    # rejected chunk is kept). Returns {'imported', 'skipped', 'errors': [(line, reason)], 'seconds'}.
+    started = time.perf_counter()
+    db_name = db_name or DB_NAME
+    run_migrations(db_name)
+    now = datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    conn = _connect(db_name, IMPORT_CACHE_KIB)
+    imported = 0
+    skipped = 0
+    errors = []
+    chunk_size = min(IMPORT_FIRST_CHUNK_ROWS, chunk_rows)
+    try:
+        rows = []
+        for line_number, record in _read_records(source, fmt, chunk_rows):
+            try:
+                rows.append(validate_grievance_record(record, now, hub_id))
+            except ValueError as e:
+                if strict:
+                    raise ValueError(f"{source}:{line_number}: {e}") from None
+                skipped += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append((line_number, str(e)))
+                continue
+            if len(rows) >= chunk_size:
+                chunk_started = time.perf_counter()
+                imported += bulk_insert_rows(conn, rows)
+                chunk_size = _next_chunk_size(len(rows), time.perf_counter() - chunk_started, chunk_rows)
+                rows = []
+                time.sleep(IMPORT_PAUSE_S) # Let writers that queued up behind this chunk in
+        if rows:
+            imported += bulk_insert_rows(conn, rows)
+    finally:
+        conn.close()
+    if imported:
+        invalidate_read_cache()
+    return {'imported': imported, 'skipped': skipped, 'errors': errors, 'seconds': round(time.perf_counter() - started, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or bulk-import Love Hub grievances (CSV, JSONL or Parquet).")
+    parser.add_argument("--db", default=None, help=f"Database file (default: {DB_NAME})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="Write every grievance to a file ('-' for stdout)")
+    export.add_argument("path")
+    export.add_argument("--format", choices=FORMATS, default=None, help="Default: from the file extension")
+    export.add_argument("--hub", default=None, help="Only this hub's grievances (default: every hub)")
+    load = commands.add_parser("import", help="Add the grievances in a file (the app's writes wait while each chunk goes in)")
+    load.add_argument("path")
+    load.add_argument("--format", choices=FORMATS, default=None, help="Default: from the file extension")
+    load.add_argument("--strict", action="store_true", help="Stop at the first invalid record instead of skipping it")
+    load.add_argument("--hub", default=DEFAULT_HUB_ID, help="Hub for records without a hub_id of their own (default: %(default)s)")
+    args = parser.parse_args()
+
+    try:
+        hub_id = normalize_hub_id(args.hub) if args.hub is not None else None
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.command == "export":
+        if args.path == "-":
+            written = export_grievances(sys.stdout.buffer, args.format or "jsonl", args.db, hub_id=hub_id)
+        else:
+            started = time.perf_counter()
+            written = export_grievances(args.path, args.format or detect_format(args.path), args.db, hub_id=hub_id)
+            print(f"Exported {written:,} grievances to {args.path} in {time.perf_counter() - started:.2f}s")
+    else:
+        try:
+            result = import_grievances(args.path, args.format or detect_format(args.path), args.db, strict=args.strict, hub_id=hub_id)
+        except ValueError as e:
+            sys.exit(f"Import stopped: {e}")
+        rate = result['imported'] / result['seconds'] if result['seconds'] else 0
+        print(f"Imported {result['imported']:,} grievances in {result['seconds']:.2f}s ({rate:,.0f} rows/s), skipped {result['skipped']:,}")
+        for line_number, reason in result['errors']:
+            print(f"  line {line_number}: {reason}")
+        if result['skipped'] > len(result['errors']):
+            print(f"  ... and {result['skipped'] - len(result['errors']):,} more")
+
+
+if __name__ == "__main__":
+    main()
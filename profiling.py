@@ -0,0 +1,136 @@
+import os
+import json
+import time
+import datetime
+import threading
+import functools
+
+# --- Profiling Setup ---
+# Opt-in per-rerun profiling: LOVE_HUB_PROFILE=1 streamlit run app.py
+# Every DB helper call (SQL text, rows, changes, time) and every render phase of a rerun is
+# collected, shown in a sidebar panel, and appended as one JSON line to the trace file.
+# When it's off, the decorators hand back the undecorated function and phase() returns at
+# once, so the app pays next to nothing for carrying the instrumentation.
+PROFILING_ENABLED = os.environ.get("LOVE_HUB_PROFILE") == "1"
+TRACE_FILE = os.environ.get("LOVE_HUB_TRACE_FILE", "love_hub_trace.jsonl")
+MAX_SQL_LENGTH = 500 # Long statements are truncated in the trace
+
+# Streamlit runs each session's script in its own thread, so thread-local state is per-rerun state
+_local = threading.local()
+_trace_file_lock = threading.Lock()
+
+def _now_ms():
+    return time.perf_counter() * 1000
+
+def start_rerun(page=None):
+    # Begins collecting a new rerun's trace. A rerun cut short by st.rerun() never reaches
+    # finish_rerun(), so its trace is flushed here, marked as interrupted.
+    if not PROFILING_ENABLED:
+        return
+    previous = getattr(_local, "trace", None)
+    if previous is not None:
+        _finish(previous, interrupted=True)
+    _local.trace = {
+        "started_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="milliseconds"),
+        "thread": threading.current_thread().name,
+        "page": page,
+        "phases": [],
+        "db_calls": [],
+        "_start_ms": _now_ms(),
+        "_phase": None,
+    }
+    _local.db_call = None
+
+def set_page(page):
+    if PROFILING_ENABLED and getattr(_local, "trace", None) is not None:
+        _local.trace["page"] = page
+
+def phase(name):
+    # Marks the start of a render phase; it runs until the next phase() or the end of the rerun
+    if not PROFILING_ENABLED:
+        return
+    trace = getattr(_local, "trace", None)
+    if trace is None:
+        return
+    now = _now_ms()
+    _close_phase(trace, now)
+    trace["_phase"] = {"name": name, "_start_ms": now, "db_ms": 0.0}
+
+def _close_phase(trace, now):
+    current = trace["_phase"]
+    if current is not None:
+        trace["phases"].append({
+            "name": current["name"],
+            "ms": round(now - current["_start_ms"], 3),
+            "db_ms": round(current["db_ms"], 3),
+        })
+        trace["_phase"] = None
+
+def _result_rows(result):
+    # Best-effort row count for whatever a helper returns
+    if isinstance(result, tuple) and result and isinstance(result[0], list):
+        return len(result[0]) # (rows, next_cursor)
+    if isinstance(result, list) or hasattr(result, "shape"):
+        return len(result)
+    return None
+
+def traced_db_call(func):
+    # Times a DB helper and records the SQL it ran. A call that runs no SQL was served from the read cache.
+    if not PROFILING_ENABLED:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        trace = getattr(_local, "trace", None)
+        outer = getattr(_local, "db_call", None)
+        if trace is None or outer is not None:
+            return func(*args, **kwargs) # Outside a rerun, or nested inside another traced helper
+        call = {"name": func.__name__, "sql": [], "changes": 0}
+        _local.db_call = call
+        start = _now_ms()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            elapsed = _now_ms() - start
+            _local.db_call = None
+            call["ms"] = round(elapsed, 3)
+            call["cached"] = not call["sql"]
+            if trace["_phase"] is not None:
+                trace["_phase"]["db_ms"] += elapsed
+            trace["db_calls"].append(call)
+        call["rows"] = _result_rows(result)
+        return result
+    return wrapper
+
+def record_sql(statement):
+    # sqlite3 trace callback: attributes each executed statement to the helper call running it
+    call = getattr(_local, "db_call", None)
+    if call is not None:
+        call["sql"].append(statement if len(statement) <= MAX_SQL_LENGTH else statement[:MAX_SQL_LENGTH] + "...")
+
+def record_changes(changes):
+    call = getattr(_local, "db_call", None)
+    if call is not None:
+        call["changes"] += changes
+
+def finish_rerun():
+    # Ends the current rerun's trace, writes it to the trace file and returns it (None if disabled)
+    if not PROFILING_ENABLED:
+        return None
+    trace = getattr(_local, "trace", None)
+    if trace is None:
+        return None
+    return _finish(trace, interrupted=False)
+
+def _finish(trace, interrupted):
+    now = _now_ms()
+    _close_phase(trace, now)
+    _local.trace = None
+    record = {key: value for key, value in trace.items() if not key.startswith("_")}
+    record["total_ms"] = round(now - trace["_start_ms"], 3)
+    record["db_ms"] = round(sum(call["ms"] for call in trace["db_calls"]), 3)
+    record["interrupted"] = interrupted
+    with _trace_file_lock:
+        with open(TRACE_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return record